@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     #
     'rest_framework',
     'djoser',
@@ -87,6 +88,10 @@ TEMPLATES = [
 WSGI_APPLICATION = "core.wsgi.application"
 
 # Настройки rest-framework
+# Аутентификация по роли и активности из подписанных утверждений JWT (без запроса пользователя к БД).
+# Отзыв токенов при изменении прав хранится в кэше - при нескольких процессах нужен общий CACHE_BACKEND
+JWT_CLAIMS_AUTH = os.getenv('JWT_CLAIMS_AUTH') == 'True'
+
 REST_FRAMEWORK = {
     # Фильтрация django-filter в rest-framework
     'DEFAULT_FILTER_BACKENDS': (
@@ -97,6 +102,8 @@ REST_FRAMEWORK = {
         # 'rest_framework.authentication.TokenAuthentication',
         # 'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
+        # Режим JWT_CLAIMS_AUTH - права из утверждений токена без запроса пользователя к БД
+        'users.authentication.ClaimsJWTAuthentication' if JWT_CLAIMS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     # rest-framework - открытый доступ ко всем данным на сервере
@@ -117,6 +124,8 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=120),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Роль и активность пользователя в утверждениях токенов
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ClaimsTokenObtainPairSerializer',
 }
 
 # TODO здесь мы настраиваем Djoser
@@ -201,6 +210,18 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+# По умолчанию - кэш в локальной памяти процесса; для нескольких процессов (gunicorn) - общий бэкенд,
+# например django.core.cache.backends.filebased.FileBasedCache или redis.RedisCache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -13,6 +13,12 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('owner', 'title', 'model', 'description')
     save_on_top = True
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по поисковому вектору и триграммам модели (GIN-индексы) вместо ICONTAINS по каждому полю"""
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
     @admin.display(description='Изображение', ordering='content')
     def ad_image(self, product: Product):
         """
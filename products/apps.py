@@ -5,3 +5,7 @@ class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
     verbose_name = 'Продукты'
+
+    def ready(self):
+        # Подключение обработчиков сигналов модели продукта
+        from . import signals  # noqa: F401
@@ -0,0 +1,242 @@
+import hashlib
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+# Кэш ответов на чтение (работает с любым бэкендом кэша Django, в т.ч. локальной памятью и файлами)
+RESPONSE_CACHE_TIMEOUT = 300  # время хранения ответа в кэше, с
+CACHE_STATS_KEY = 'cache:stats:{name}:{counter}'
+CACHED_RESPONSES = ('product-list', 'product-detail', 'supplier-detail', 'supplier-analytics')
+# Защита от одновременного пересчёта одного ответа (single-flight)
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30  # время жизни блокировки пересчёта (если вычисляющий процесс завершился), с
+SINGLE_FLIGHT_WAIT = 5  # наибольшее время ожидания результата другого процесса, с
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05  # интервал проверки результата при ожидании, с
+STALE_CACHE_TIMEOUT = 3600  # время хранения устаревшей копии ответа (stale-while-revalidate), с
+
+# Версия каталога продуктов: входит в ключи страниц списков продуктов
+PRODUCT_VERSION_KEY = 'products:catalog:version'
+
+
+def _count(name: str, counter: str):
+    """Увеличение счётчика попаданий или промахов кэша"""
+    key = CACHE_STATS_KEY.format(name=name, counter=counter)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счётчик вытеснен из кэша между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def single_flight(key: str, build, stale_key: str | None = None) -> tuple:
+    """
+    Чтение значения из кэша с защитой от «набега» при промахе (single-flight): значение строит только
+    процесс, захвативший блокировку ключа в кэше (cache.add атомарен во всех бэкендах), остальные
+    ждут его результата, а при наличии устаревшей копии (stale_key) сразу получают её (stale-while-revalidate).
+    Если результата не удалось дождаться, значение строится без блокировки.
+    :param key: Ключ кэша, str.
+    :param build: Функция построения значения; None - значение не сохраняется в кэше.
+    :param stale_key: Ключ устаревшей копии значения, переживающей смену версии в основном ключе, str.
+    :return: Значение и флаг попадания в кэш, tuple.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+    while True:
+        if cache.add(lock_key, 1, SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                # Значение могли сохранить между проверкой и захватом блокировки
+                value = cache.get(key)
+                if value is not None:
+                    return value, True
+                value = build()
+                if value is not None:
+                    cache.set(key, value, RESPONSE_CACHE_TIMEOUT)
+                    if stale_key:
+                        cache.set(stale_key, value, STALE_CACHE_TIMEOUT)
+                return value, False
+            finally:
+                cache.delete(lock_key)
+
+        if stale_key:
+            value = cache.get(stale_key)
+            if value is not None:
+                return value, True
+        if time.monotonic() >= deadline:
+            return build(), False
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value, True
+
+
+def cached_response(name: str, key: str, build, stale_key: str | None = None):
+    """
+    Чтение данных ответа из кэша с построением и сохранением при промахе (read-through)
+    без одновременного построения одного ответа несколькими процессами.
+    :param name: Имя кэшируемого ответа для счётчиков, str.
+    :param key: Ключ кэша, str.
+    :param build: Функция построения данных ответа при промахе.
+    :param stale_key: Ключ устаревшей копии, отдаваемой во время построения ответа, str.
+    :return: Данные ответа.
+    """
+    data, hit = single_flight(key, build, stale_key)
+    _count(name, 'hits' if hit else 'misses')
+    return data
+
+
+def object_validators(objects, state=None) -> tuple[str, datetime | None]:
+    """
+    Валидаторы условного GET по загруженным объектам ответа (без их сериализации).
+    ETag - хэш идентификаторов и времени изменения объектов и состояния страницы (общего количества
+    или следующего курсора), поэтому учитывает и удаление, и сдвиг строк страницы. Last-Modified - время
+    последнего изменения; удаление строк списка его не изменяет, поэтому клиентам следует передавать If-None-Match.
+    :param objects: Объекты ответа с полем updated_at, iterable.
+    :param state: Состояние страницы за пределами её строк.
+    :return: ETag и время последнего изменения, tuple[str, datetime | None].
+    """
+    objects = list(objects)
+    rows = [(obj.pk, obj.updated_at.isoformat()) for obj in objects]
+    etag = hashlib.md5(repr((state, rows)).encode()).hexdigest()
+    return f'"{etag}"', max((obj.updated_at for obj in objects), default=None)
+
+
+def not_modified(request, etag: str, last_modified: datetime | None):
+    """
+    Проверка условий запроса (If-None-Match, If-Modified-Since) по валидаторам ответа.
+    :return: Ответ 304 (412 для невыполненных If-Match/If-Unmodified-Since) или None, если ответ нужно отдать.
+    """
+    return get_conditional_response(request, etag=etag,
+                                    last_modified=last_modified and int(last_modified.timestamp()))
+
+
+def validated_response(data, etag: str, last_modified: datetime | None) -> Response:
+    """Ответ с заголовками валидаторов ETag и Last-Modified"""
+    response = Response(data)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, objects, state, serialize):
+    """
+    Условный ответ: при совпадении валидаторов - 304 без сериализации объектов.
+    :param request: Запрос.
+    :param objects: Загруженные объекты ответа (объект детализации или строки страницы), list.
+    :param state: Состояние страницы за пределами её строк.
+    :param serialize: Функция сериализации объектов в данные ответа.
+    :return: Ответ.
+    """
+    etag, last_modified = object_validators(objects, state)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    return validated_response(serialize(objects), etag, last_modified)
+
+
+def cached_conditional_response(request, name: str, key: str, load, serialize, stale_key: str | None = None):
+    """
+    Условный ответ из кэша: данные хранятся вместе с валидаторами, поэтому при попадании
+    ответ (или 304) отдаётся без обращений к БД. При промахе объекты загружаются (одним процессом,
+    см. single_flight), и при совпадении валидаторов отдаётся 304 без сериализации,
+    иначе данные сериализуются и сохраняются в кэше.
+    :param request: Запрос.
+    :param name: Имя кэшируемого ответа для счётчиков, str.
+    :param key: Ключ кэша, str.
+    :param load: Функция загрузки объектов ответа, возвращает объекты и состояние страницы.
+    :param serialize: Функция сериализации объектов в данные ответа.
+    :param stale_key: Ключ устаревшей копии, отдаваемой во время построения ответа, str.
+    :return: Ответ.
+    """
+    response = None
+
+    def build():
+        nonlocal response
+        objects, state = load()
+        etag, last_modified = object_validators(objects, state)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return None
+        return {'etag': etag, 'last_modified': last_modified, 'data': serialize(objects)}
+
+    entry, hit = single_flight(key, build, stale_key)
+    _count(name, 'hits' if hit else 'misses')
+    if entry is None:
+        return response
+    response = not_modified(request, entry['etag'], entry['last_modified'])
+    if response is not None:
+        return response
+    return validated_response(entry['data'], entry['etag'], entry['last_modified'])
+
+
+def cache_stats() -> dict:
+    """
+    Счётчики попаданий и промахов кэша ответов.
+    :return: Попадания и промахи по именам кэшируемых ответов, dict.
+    """
+    keys = {(name, counter): CACHE_STATS_KEY.format(name=name, counter=counter)
+            for name in CACHED_RESPONSES for counter in ('hits', 'misses')}
+    values = cache.get_many(keys.values())
+    return {name: {counter: values.get(keys[name, counter], 0) for counter in ('hits', 'misses')}
+            for name in CACHED_RESPONSES}
+
+
+def bump_version(key: str):
+    """Увеличение версии данных, входящей в ключи кэша"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключа нет в кэше (например, кэш очищен) - начинаем новую версию
+        cache.set(key, 2, timeout=None)
+
+
+def get_version(key: str) -> int:
+    """Текущая версия данных, входящая в ключи кэша"""
+    cache.add(key, 1, timeout=None)
+    return cache.get(key, 1)
+
+
+def product_version() -> int:
+    """Текущая версия каталога продуктов"""
+    return get_version(PRODUCT_VERSION_KEY)
+
+
+def product_detail_key(pk) -> str:
+    return f'products:detail:{pk}'
+
+
+def product_list_key(url: str) -> str:
+    """
+    Ключ страницы списка продуктов: версия каталога и полный адрес запроса - схема и хост (ссылки next/previous
+    в ответе абсолютные) и параметры (страница, фильтры, поиск).
+    """
+    return f'products:list:{product_version()}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def product_list_stale_key(url: str) -> str:
+    """Ключ устаревшей копии страницы списка продуктов (без версии каталога)"""
+    return f'products:list:stale:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def invalidate_product_cache(product_ids=()):
+    """
+    Сброс кэша продуктов после фиксации транзакции: детализация указанных продуктов и все страницы списков
+    (детализации поставщиков этих продуктов сбрасываются обработчиком сигнала products_updated).
+    :param product_ids: Идентификаторы изменённых продуктов, iterable.
+    """
+    keys = [product_detail_key(pk) for pk in product_ids]
+
+    def invalidate():
+        cache.delete_many(keys)
+        bump_version(PRODUCT_VERSION_KEY)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,14 @@
+import django_filters
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """Полнотекстовый поиск продуктов по названию, модели и описанию с ранжированием"""
+    search = django_filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
+
+    class Meta:
+        model = Product
+        fields = ['search']
@@ -0,0 +1,131 @@
+import csv
+import json
+import time
+
+from django.db import transaction
+
+from products.models import Product
+from products.serializers import ProductImportSerializer
+from products.signals import products_updated
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 1000  # количество строк файла, загружаемых в одной транзакции
+
+
+def iter_import_rows(stream, file_format: str):
+    """
+    Потоковое чтение строк файла импорта.
+    :param stream: Текстовый поток с данными.
+    :param file_format: Формат файла: csv (первая строка - заголовок) или jsonl (один объект JSON на строку), str.
+    :return: Генератор пар (номер строки, данные строки) - dict или сообщение об ошибке разбора, str.
+    """
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            # Пустые значения CSV считаем отсутствующими
+            yield number, {key: value for key, value in row.items() if value not in ('', None)}
+        return
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, f'Некорректный JSON: {error}'
+            continue
+        yield number, row if isinstance(row, dict) else 'Строка должна содержать объект JSON'
+
+
+class ProductImporter:
+    """
+    Пакетная загрузка каталога продуктов (upsert) из CSV или JSONL.
+    Продукт сопоставляется с существующими по паре (title, model): найденные продукты обновляются,
+    остальные создаются сразу с владельцем. Файл читается потоково пакетами по batch_size строк,
+    каждый пакет - один запрос поиска, один bulk_update и один bulk_create в одной транзакции.
+    Уникального ограничения на (title, model) нет (API допускает одинаковые продукты),
+    поэтому вместо bulk_create(update_conflicts=True) используется поиск по индексу (title, model).
+    Ошибочные строки попадают в отчёт и не прерывают загрузку.
+    """
+
+    def __init__(self, owner=None, batch_size: int = IMPORT_BATCH_SIZE):
+        self.owner = owner
+        # Обновлять чужие продукты может только администратор (или загрузка без владельца из консоли)
+        self.can_update_all = owner is None or owner.is_admin
+        self.batch_size = batch_size
+        self.report = {'rows': 0, 'created': 0, 'updated': 0, 'errors': []}
+
+    def run(self, stream, file_format: str) -> dict:
+        """
+        Загрузка продуктов из потока.
+        :param stream: Текстовый поток с данными.
+        :param file_format: Формат файла: csv или jsonl, str.
+        :return: Отчёт: количество строк, созданных и обновлённых продуктов, ошибки по строкам,
+        время загрузки и производительность (строк в секунду), dict.
+        """
+        started = time.monotonic()
+        batch = []
+        for number, row in iter_import_rows(stream, file_format):
+            self.report['rows'] += 1
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        self.report['errors'].sort(key=lambda error: error['row'])
+
+        seconds = time.monotonic() - started
+        self.report['seconds'] = round(seconds, 3)
+        self.report['rows_per_second'] = round(self.report['rows'] / seconds) if seconds else self.report['rows']
+        return self.report
+
+    def import_batch(self, batch: list):
+        """Загрузка пакета строк в одной транзакции"""
+        rows = {}  # (title, model) -> (номер строки, проверенные данные); повтор ключа заменяет предыдущую строку
+        for number, row in batch:
+            if isinstance(row, str):
+                self.report['errors'].append({'row': number, 'errors': [row]})
+                continue
+            serializer = ProductImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.report['errors'].append({'row': number, 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            rows[(data['title'], data['model'])] = (number, data)
+        if not rows:
+            return
+
+        # Существующие продукты пакета одним запросом по индексу (title, model)
+        titles = {title for title, _ in rows}
+        models = {model for _, model in rows}
+        existing = {}
+        products = Product.objects.filter(title__in=titles, model__in=models).only('id', 'title', 'model', 'owner_id')
+        for product in products:
+            existing.setdefault((product.title, product.model), []).append(product)
+
+        to_create, to_update = [], {}
+        for key, (number, data) in rows.items():
+            if key not in existing:
+                to_create.append(Product(owner=self.owner, **data))
+                continue
+            if not self.can_update_all and any(product.owner_id != self.owner.pk for product in existing[key]):
+                message = 'Доступ запрещён, потому что Вы не являетесь владельцем.'
+                self.report['errors'].append({'row': number, 'errors': [message]})
+                continue
+            # Продукты группируются по набору переданных полей, чтобы не затирать непереданные значения
+            fields = tuple(sorted(set(data) - {'title', 'model'}))
+            for product in existing[key]:
+                for name in fields:
+                    setattr(product, name, data[name])
+                to_update.setdefault(fields, []).append(product)
+
+        with transaction.atomic():
+            Product.objects.bulk_create(to_create)
+            for fields, products in to_update.items():
+                if fields:
+                    Product.objects.bulk_update(products, fields)
+            # Пакетные операции не вызывают сигналов моделей - уведомляем об изменении продуктов явно
+            products_updated.send(sender=Product, product_ids=[
+                product.pk for products in to_update.values() for product in products])
+        self.report['created'] += len(to_create)
+        self.report['updated'] += sum(len(products) for products in to_update.values())
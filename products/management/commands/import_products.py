@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand, CommandError
+
+from products.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, ProductImporter
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Пакетная загрузка каталога продуктов из файла CSV или JSONL"""
+    help = 'Загрузка (создание и обновление по паре title, model) продуктов из файла CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу каталога')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--owner', help='Электронная почта владельца создаваемых продуктов')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Количество строк, загружаемых в одной транзакции')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}. Доступные: {", ".join(IMPORT_FORMATS)}.')
+
+        owner = None
+        if options['owner']:
+            owner = User.objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f'Пользователь {options["owner"]} не найден.')
+
+        importer = ProductImporter(owner=owner, batch_size=options['batch_size'])
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = importer.run(stream, file_format)
+
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {report["rows"]}, создано: {report["created"]}, обновлено: {report["updated"]}, '
+            f'ошибок: {len(report["errors"])}, {report["rows_per_second"]} строк/с.'))
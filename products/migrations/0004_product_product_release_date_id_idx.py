@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_alter_product_release_date"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["release_date", "id"], name="product_release_date_id_idx"
+            ),
+        ),
+    ]
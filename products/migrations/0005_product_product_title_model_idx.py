@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_product_product_release_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["title", "model"], name="product_title_model_idx"
+            ),
+        ),
+    ]
@@ -1,9 +1,46 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Now
 from django.utils import timezone
 from users.models import User
 
 NULLABLE = {'blank': True, 'null': True}
 
+# Конфигурация полнотекстового поиска PostgreSQL (совпадает с конфигурацией триггера в миграции 0006)
+SEARCH_CONFIG = 'russian'
+
+
+class UpdatedAtQuerySet(models.QuerySet):
+    """
+    Набор запросов моделей со временем изменения updated_at: массовые изменения (update, bulk_update)
+    не вызывают save(), поэтому время изменения проставляется в том же UPDATE.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', Now())
+        return super().update(**kwargs)
+
+
+class ProductQuerySet(UpdatedAtQuerySet):
+    """Набор запросов продуктов"""
+
+    def search(self, text: str):
+        """
+        Полнотекстовый поиск продуктов с ранжированием.
+        Название и описание ищутся по столбцу search_vector (GIN-индекс), модель - также
+        нечётко по триграммам (GIN-индекс gin_trgm_ops), что находит номера моделей с опечатками.
+        :param text: Поисковый запрос (синтаксис websearch: слова, "фраза", -исключение), str.
+        :return: Найденные продукты, упорядоченные по убыванию релевантности.
+        """
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(
+            Q(search_vector=query) | Q(model__trigram_similar=text)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query) + TrigramSimilarity('model', text),
+        ).order_by('-rank', 'id')
+
 
 class Product(models.Model):
     """ Модель продукта """
@@ -15,6 +52,12 @@ class Product(models.Model):
     description = models.TextField(**NULLABLE, verbose_name='описание')
     image = models.ImageField(upload_to='products/%Y/%m/%d/', **NULLABLE, verbose_name='превью')
     release_date = models.DateTimeField(default=timezone.now, verbose_name='дата выхода на рынок')
+    # Время изменения - валидатор условных запросов (ETag, Last-Modified) списков и детализации
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='дата и время изменения')
+    # Поисковый вектор названия, модели и описания - заполняется триггером БД при вставке и изменении
+    search_vector = SearchVectorField(editable=False, **NULLABLE, verbose_name='поисковый вектор')
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.title} - {self.model}'
@@ -22,3 +65,12 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'продукт'
         verbose_name_plural = 'продукты'
+        indexes = [
+            # Ключ курсорной пагинации списка продуктов
+            models.Index(fields=['release_date', 'id'], name='product_release_date_id_idx'),
+            # Сопоставление продуктов при пакетной загрузке каталога
+            models.Index(fields=['title', 'model'], name='product_title_model_idx'),
+            # Полнотекстовый поиск и нечёткий поиск по номеру модели
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['model'], name='product_model_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
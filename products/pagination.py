@@ -1,7 +1,117 @@
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPaginationMixin:
+    """
+    Опциональная курсорная (keyset) пагинация, включается параметром ?pagination=cursor.
+    Страница выбирается условием на ключ сортировки (значение поля, id) без OFFSET и COUNT(*),
+    поэтому при наличии составного индекса по ключу любая страница стоит столько же, сколько первая.
+    """
+    pagination_mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    # Поле сортировки и уникальное поле, разрешающее совпадения значений первого поля
+    keyset_ordering = ('id', 'id')
+    # Параметры запроса, задающие собственный порядок строк (несовместимы с курсорной пагинацией)
+    keyset_excluded_params = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = request.query_params.get(self.pagination_mode_query_param) == 'cursor'
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        excluded = [name for name in self.keyset_excluded_params if name in request.query_params]
+        if excluded:
+            raise ValidationError(f'Курсорная пагинация несовместима с параметрами: {", ".join(excluded)}.')
+
+        self.request = request
+        field, key = self.keyset_ordering
+        queryset = queryset.order_by(field, key)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            value, pk = position
+            # Условие field >= value используется как граница диапазона индекса,
+            # второе условие отсекает уже выданные строки с тем же значением поля
+            queryset = queryset.filter(**{f'{field}__gte': value}).filter(
+                Q(**{f'{field}__gt': value}) | Q(**{f'{key}__gt': pk}))
+
+        page_size = self.get_page_size(request)
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = (getattr(results[-1], field), getattr(results[-1], key))
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def get_page_state(self):
+        """
+        Состояние выборки за пределами строк страницы (для валидаторов условного GET):
+        общее количество строк или, при курсорной пагинации, позиция следующей страницы.
+        """
+        if self.keyset:
+            return self.next_position
+        return self.page.paginator.count
+
+    def encode_cursor(self, position) -> str:
+        """
+        Кодирование позиции последней строки страницы в курсор.
+        :param position: Значение поля сортировки и уникального поля, tuple.
+        :return: Курсор, str.
+        """
+        value, pk = position
+        value = value.isoformat() if hasattr(value, 'isoformat') else value
+        return base64.urlsafe_b64encode(f'{value}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        """
+        Декодирование курсора из запроса; значения проверяются и приводятся полями модели.
+        :param model: Модель пагинируемой выборки.
+        :return: Значение поля сортировки и уникального поля, tuple, или None для первой страницы.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        field, key = self.keyset_ordering
+        try:
+            value, pk = base64.urlsafe_b64decode(encoded.encode()).decode().rsplit('|', 1)
+            return model._meta.get_field(field).to_python(value), model._meta.get_field(key).to_python(pk)
+        except (TypeError, ValueError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
 
 
-class ProductPagination(PageNumberPagination):
+class ProductPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 4
     page_query_param = 'page_size'
     max_page_size = 10
+    keyset_ordering = ('release_date', 'id')
+    # Результаты поиска упорядочены по рангу, а не по ключу курсора
+    keyset_excluded_params = ('search',)
@@ -22,4 +22,5 @@ class IsOwner(BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        # Сравнение идентификаторов не загружает владельца объекта из БД
+        return obj.owner_id == request.user.pk
@@ -11,4 +11,13 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = '__all__'
+        # Поисковый вектор - служебное поле для поиска
+        exclude = ('search_vector',)
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """ Сериализатор проверки полей продукта при пакетной загрузке каталога (без обращений к БД) """
+
+    class Meta:
+        model = Product
+        fields = ('title', 'model', 'description', 'release_date')
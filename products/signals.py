@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import invalidate_product_cache
+from .models import Product
+
+# Изменение продуктов, в т.ч. пакетными операциями без сигналов моделей (аргумент product_ids)
+products_updated = Signal()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """Уведомление об изменении сохранённого продукта"""
+    products_updated.send(sender=Product, product_ids=[instance.pk])
+
+
+@receiver(products_updated, sender=Product)
+def invalidate_products(sender, product_ids, **kwargs):
+    """Сброс кэша изменённых продуктов и списков продуктов"""
+    invalidate_product_cache(product_ids)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    """Сброс кэша удалённого продукта и списков продуктов"""
+    invalidate_product_cache([instance.pk])
@@ -1,6 +1,6 @@
 from django.urls import path
 from products.apps import ProductsConfig
-from products.views import ProductViewSet
+from products.views import CacheStatsAPIView, ProductViewSet
 
 app_name = ProductsConfig.name
 
@@ -15,8 +15,13 @@ product_detail = ProductViewSet.as_view({
     'patch': 'partial_update',
     'delete': 'destroy'
 })
+product_import = ProductViewSet.as_view({
+    'post': 'bulk_import'
+})
 
 urlpatterns = [
     path('products/', product_list, name='product-list'),
     path('products/<int:pk>/', product_detail, name='product-detail'),
+    path('products/import/', product_import, name='product-import'),
+    path('cache/stats/', CacheStatsAPIView.as_view(), name='cache-stats'),
 ]
@@ -1,11 +1,21 @@
+import io
+
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.shortcuts import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from products.cache import cache_stats, cached_conditional_response, product_detail_key, product_list_key, \
+    product_list_stale_key
+from products.filters import ProductFilter
+from products.importers import IMPORT_FORMATS, ProductImporter
 from products.models import Product
 from products.pagination import ProductPagination
-from users.models import User
 from products.permissions import IsAdmin, IsOwner
 from products.serializers import ProductSerializer
+from users.models import UserRoles
 
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -13,14 +23,15 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     pagination_class = ProductPagination
+    filterset_class = ProductFilter
 
     def get_permissions(self):
         """Права доступа"""
         if self.action == 'retrieve':
             # Детальный просмотр продукта - доступен аутентифицированным пользователям (IsOwner, IsAdmin)
             permission_classes = [IsAuthenticated]
-        elif self.action == 'create':
-            # Создание продукта - доступно аутентифицированным пользователям (IsOwner, IsAdmin)
+        elif self.action in ['create', 'bulk_import']:
+            # Создание и пакетная загрузка продуктов - доступны аутентифицированным пользователям (IsOwner, IsAdmin)
             permission_classes = [IsAuthenticated]
         elif self.action in ['update', 'partial_update', 'destroy']:
             # Изменение и удаление продуктов - доступно владельцам (IsOwner) или админам (IsAdmin)
@@ -30,8 +41,73 @@ class ProductViewSet(viewsets.ModelViewSet):
             permission_classes = [AllowAny]
         return [permission() for permission in permission_classes]
 
+    def get_queryset(self):
+        """Продукты с набором столбцов, необходимым действию"""
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            # Для проверки владельца и удаления достаточно идентификаторов
+            return queryset.only('id', 'owner')
+        if self.action in ['update', 'partial_update']:
+            # Владелец входит в ответ - загружаем его тем же запросом
+            return queryset.select_related('owner')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список продуктов из кэша (ключ - версия каталога и адрес запроса вместе с хостом)
+        с поддержкой условных запросов: 304 по If-None-Match/If-Modified-Since без сериализации.
+        Пока один процесс строит истёкшую страницу, остальные получают её предыдущую копию.
+        """
+        def load():
+            page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            return page, self.paginator.get_page_state()
+
+        def serialize(page):
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+        url = request.build_absolute_uri()
+        return cached_conditional_response(request, 'product-list', product_list_key(url), load, serialize,
+                                           stale_key=product_list_stale_key(url))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Детальный просмотр продукта из кэша с поддержкой условных запросов"""
+        key = product_detail_key(kwargs[self.lookup_field])
+        return cached_conditional_response(request, 'product-detail', key, lambda: ([self.get_object()], None),
+                                           lambda objects: self.get_serializer(objects[0]).data)
+
     def perform_create(self, serializer):
-        """Создание продукта и установление владельца."""
-        product = serializer.save()
-        product.owner = get_object_or_404(User, id=self.request.user.id)
-        product.save()
+        """Создание продукта и установление владельца (одним сохранением)."""
+        serializer.save(owner=self.request.user)
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Пакетная загрузка каталога продуктов из файла CSV или JSONL (поле file формы).
+        Продукты сопоставляются по паре (title, model): найденные обновляются, остальные создаются.
+        Формат задаётся параметром ?input=csv|jsonl или определяется по расширению файла.
+        Обновлять чужие продукты может только администратор.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError('Не передан файл загрузки (поле file).')
+
+        file_format = request.query_params.get('input') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise ValidationError(f'Неизвестный формат файла: {file_format}. Доступные: {", ".join(IMPORT_FORMATS)}.')
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        report = ProductImporter(owner=request.user).run(stream, file_format)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Счётчики попаданий и промахов кэша ответов (списки и детализация продуктов, детализация и аналитика
+    поставщиков). Просматривать может только администратор.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != UserRoles.ADMIN:
+            raise PermissionDenied('Статистика кэша доступна только администратору.')
+        return Response(cache_stats())
@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import NetworkSupplier, ProductNetworkSupplier
+from .ledger import clear_debt
+from .services import prefetch_supplier_chains
 from django import forms
 
 
@@ -66,6 +69,8 @@ class NetworkSupplierAdminForm(forms.ModelForm):
         # Проверяем условие, что у завода не может быть поставщика
         if supplier_type == 0 and supplier:
             self.add_error('supplier', 'Поставщик типа "Завод" не может иметь поставщика.')
+        elif supplier and self.instance.pk and supplier.is_in_subtree_of(self.instance):
+            self.add_error('supplier', 'Нельзя переместить поставщика в его собственную цепочку.')
 
         # Проверяем указанный уровень
         if supplier:
@@ -76,14 +81,28 @@ class NetworkSupplierAdminForm(forms.ModelForm):
         return cleaned_data
 
 
+class NetworkSupplierChangeList(ChangeList):
+    """Список поставщиков, загружающий цепочки поставщиков всей страницы одним запросом"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.result_list = prefetch_supplier_chains(self.result_list)
+
+
 @admin.register(NetworkSupplier)
 class NetworkSupplierAdmin(admin.ModelAdmin):
     inlines = [ProductNetworkSupplierInline]
     list_display = ('id', 'author', 'name', 'get_supplier_chain', 'level', 'country', 'city', 'supplier_link', 'debt')
     list_filter = ('name', 'type_supplier', 'country', 'city',)
+    list_select_related = ('author', 'supplier')
     actions = ['clear_debt']
+    # Задолженность изменяется только проведением записей журнала задолженности
+    readonly_fields = ('debt',)
     form = NetworkSupplierAdminForm
 
+    def get_changelist(self, request, **kwargs):
+        return NetworkSupplierChangeList
+
     def supplier_link(self, obj):
         if obj.supplier:
             return format_html(
@@ -94,22 +113,18 @@ class NetworkSupplierAdmin(admin.ModelAdmin):
     supplier_link.short_description = 'Поставщик'
 
     def clear_debt(self, request, queryset):
-        queryset.update(debt=0)
+        # Задолженность погашается записями оплаты в журнале задолженности
+        clear_debt(queryset, author=request.user)
 
     clear_debt.short_description = 'Очистить задолженность у выбранных поставщиков'
 
     @admin.display(description='Цепочка поставщиков')
     def get_supplier_chain(self, obj):
         """Цепочка поставщиков для большей наглядности"""
-        # Формируем список поставщиков
-        suppliers = [obj.supplier]
-        current_supplier = obj.supplier
-        while current_supplier:
-            # Вставляем текущего поставщика в начало списка
-            suppliers.insert(0, current_supplier.supplier)
-            # Присваиваем переменной current_supplier родителя текущего поставщика
-            # для перемещения по иерархии поставщиков от текущего поставщика к его родителям.
-            current_supplier = current_supplier.supplier
+        # Цепочка загружается для всей страницы списка заранее, иначе - одним запросом по материализованному пути
+        suppliers = getattr(obj, 'supplier_chain', None)
+        if suppliers is None:
+            suppliers = list(obj.get_ancestors())
 
         supplier_links = []
         # Создаем список ссылок на поставщиков
@@ -0,0 +1,48 @@
+from django.db.models import Count, Sum
+
+from products.cache import cached_response
+
+from .cache import network_version
+from .models import NetworkSupplier, ProductNetworkSupplier
+
+# Группировки аналитики сети поставщиков
+ANALYTICS_GROUPS = {
+    'country': ('country',),
+    'city': ('country', 'city'),
+    'level': ('level',),
+}
+
+
+def build_supplier_analytics(group_by: str) -> list[dict]:
+    """
+    Количество поставщиков, сумма задолженности и количество различных товаров по группам.
+    Агрегирование выполняется в БД двумя запросами: поставщики и задолженность считаются без соединения
+    с поставками (иначе строки поставщика повторялись бы по числу его товаров), товары - по поставкам.
+    :param group_by: Группировка: country, city или level, str.
+    :return: Группы с показателями, list[dict].
+    """
+    fields = ANALYTICS_GROUPS[group_by]
+    groups = NetworkSupplier.objects.order_by(*fields).values(*fields).annotate(
+        suppliers=Count('id'), debt=Sum('debt', default=0))
+
+    link_fields = [f'network_supplier__{field_name}' for field_name in fields]
+    products = {
+        tuple(row[field_name] for field_name in link_fields): row['products']
+        for row in ProductNetworkSupplier.objects.order_by().values(*link_fields).annotate(
+            products=Count('product', distinct=True))
+    }
+    return [dict(group, products=products.get(tuple(group[field_name] for field_name in fields), 0))
+            for group in groups]
+
+
+def supplier_analytics(group_by: str) -> list[dict]:
+    """
+    Аналитика сети поставщиков из кэша. Ключ содержит версию данных сети, поэтому при изменении
+    поставщиков, поставок или задолженности результат пересчитывается при следующем запросе
+    (одним процессом - остальные на время пересчёта получают предыдущий результат).
+    :param group_by: Группировка: country, city или level, str.
+    :return: Группы с показателями, list[dict].
+    """
+    key = f'suppliers:analytics:{network_version()}:{group_by}'
+    return cached_response('supplier-analytics', key, lambda: build_supplier_analytics(group_by),
+                           stale_key=f'suppliers:analytics:stale:{group_by}')
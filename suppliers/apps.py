@@ -5,3 +5,7 @@ class SuppliersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "suppliers"
     verbose_name = 'Поставки'
+
+    def ready(self):
+        # Подключение обработчиков сигналов моделей поставщиков
+        from . import signals  # noqa: F401
@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from products.cache import bump_version, get_version
+
+# Версия данных сети поставщиков: входит в ключи кэша производных данных (аналитики),
+# поэтому увеличение версии делает устаревшими все закэшированные значения сразу
+NETWORK_VERSION_KEY = 'suppliers:network:version'
+
+
+def network_version() -> int:
+    """
+    Текущая версия данных сети поставщиков.
+    :return: Версия, int.
+    """
+    return get_version(NETWORK_VERSION_KEY)
+
+
+def supplier_detail_key(pk) -> str:
+    """
+    Ключ детализации поставщика. В ответ входят товары - при их изменении сбрасываются детализации
+    только их поставщиков (см. обработчик сигнала products_updated).
+    """
+    return f'suppliers:detail:{pk}'
+
+
+def invalidate_supplier_details(supplier_ids=()):
+    """
+    Сброс кэша детализации поставщиков после фиксации транзакции без смены версии сети
+    (изменились только данные ответов, например товары, а не сама сеть).
+    :param supplier_ids: Идентификаторы поставщиков, iterable.
+    """
+    keys = [supplier_detail_key(pk) for pk in set(supplier_ids)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_network_cache(supplier_ids=()):
+    """
+    Сброс кэша сети после фиксации транзакции (иначе параллельный запрос может закэшировать
+    ещё не зафиксированное состояние): производные данные - через версию сети,
+    детализация - точно для изменённых поставщиков.
+    :param supplier_ids: Идентификаторы изменённых поставщиков (вместе с поставщиками их цепочек,
+    в которых изменились агрегаты), iterable.
+    """
+    keys = [supplier_detail_key(pk) for pk in set(supplier_ids)]
+
+    def invalidate():
+        cache.delete_many(keys)
+        bump_version(NETWORK_VERSION_KEY)
+
+    transaction.on_commit(invalidate)
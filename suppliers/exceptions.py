@@ -0,0 +1,13 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ProductAvailabilityError(APIException):
+    """Ошибка: у родительского поставщика нет выбранных товаров"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'У поставщика нет выбранных товаров.'
+    default_code = 'product_unavailable'
+
+    def __init__(self, report: dict):
+        # Отчёт передаётся в ответ как есть, чтобы идентификаторы и количества оставались числами
+        self.detail = report
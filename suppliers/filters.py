@@ -3,9 +3,20 @@ from .models import NetworkSupplier
 
 
 class NetworkSupplierFilter(django_filters.FilterSet):
-    """Фильтр по полю 'город' при условии точного совпадения запроса"""
+    """
+    Фильтр поставщиков. Каждому фильтру (и их частым сочетаниям) соответствует индекс модели:
+    страна и город без учёта регистра - функциональные индексы по UPPER(...), уровень и тип поставщика -
+    составные индексы с задолженностью, поставщик - индекс внешнего ключа.
+    """
+    country = django_filters.CharFilter(lookup_expr='iexact')
     city = django_filters.CharFilter(lookup_expr='iexact')
+    level = django_filters.NumberFilter()
+    type_supplier = django_filters.ChoiceFilter(choices=NetworkSupplier.LEVEL_CHOICES)
+    # Диапазон задолженности: ?debt_min=...&debt_max=...
+    debt = django_filters.RangeFilter()
+    # Идентификатор поставщика без проверки его существования отдельным запросом
+    supplier = django_filters.NumberFilter(field_name='supplier_id')
 
     class Meta:
         model = NetworkSupplier
-        fields = ['city']
+        fields = ['country', 'city', 'level', 'type_supplier', 'debt', 'supplier']
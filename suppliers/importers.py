@@ -0,0 +1,231 @@
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from products.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, iter_import_rows
+from products.models import Product
+from .cache import invalidate_network_cache
+from .models import DebtEntry, NetworkSupplier, ProductNetworkSupplier, PATH_SEPARATOR, chain_rollup_deltas
+from .serializers import NetworkSupplierImportSerializer
+
+
+def parse_id_list(value) -> list:
+    """
+    Приведение списка идентификаторов из строки файла к списку: в CSV идентификаторы
+    разделяются пробелами или запятыми, в JSONL передаются списком.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.replace(',', ' ').split()
+    if not isinstance(value, list):
+        raise ValueError
+    return [int(item) for item in value]
+
+
+@dataclass
+class ImportRow:
+    """Проверенная строка импорта поставщика"""
+    number: int
+    data: dict
+    product_ids: list[int]
+    ref: str | None = None
+    parent_id: int | None = None
+    parent_ref: str | None = None
+
+
+@dataclass
+class ImportedSupplier:
+    """Сведения о поставщике, созданном из строки импорта, для ссылок из следующих строк"""
+    pk: int
+    path: str
+    level: int
+    product_ids: set[int] = field(default_factory=set)
+
+
+class SupplierImporter:
+    """
+    Пакетный импорт поставщиков из CSV или JSONL.
+    Строка файла описывает поставщика (поля модели), его товары (products) и поставщика-родителя:
+    существующего - по идентификатору (supplier) или созданного из другой строки файла -
+    по её ключу (supplier_ref, ключ строки задаётся полем ref).
+    Файл читается потоково пакетами по batch_size строк. Для каждого пакета фиксированным числом запросов
+    проверяются товары и их наличие у родителей, затем поставщики создаются через bulk_create волнами
+    в топологическом порядке (сначала родители, затем их потомки из того же пакета), что позволяет
+    вычислить уровни и материализованные пути. Ошибочные строки попадают в отчёт и не прерывают импорт.
+    """
+
+    def __init__(self, author=None, batch_size: int = IMPORT_BATCH_SIZE):
+        self.author = author
+        self.batch_size = batch_size
+        self.imported = {}  # ключ строки (ref) -> ImportedSupplier
+        self.failed_refs = set()  # ключи строк, которые не удалось импортировать
+        self.report = {'rows': 0, 'created': 0, 'links': 0, 'errors': []}
+
+    def run(self, stream, file_format: str) -> dict:
+        """
+        Импорт поставщиков из потока.
+        :param stream: Текстовый поток с данными.
+        :param file_format: Формат файла: csv или jsonl, str.
+        :return: Отчёт: количество строк, созданных поставщиков и поставок, ошибки по строкам, dict.
+        """
+        batch = []
+        for number, row in iter_import_rows(stream, file_format):
+            self.report['rows'] += 1
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        self.report['errors'].sort(key=lambda error: error['row'])
+        return self.report
+
+    def add_error(self, number: int, errors, ref: str | None = None):
+        """Добавление ошибки строки в отчёт"""
+        self.report['errors'].append({'row': number, 'errors': errors})
+        if ref:
+            self.failed_refs.add(ref)
+
+    def parse_row(self, number: int, row) -> ImportRow | None:
+        """
+        Проверка полей строки без обращения к БД.
+        :return: Проверенная строка, ImportRow, или None, если найдены ошибки.
+        """
+        if isinstance(row, str):
+            self.add_error(number, [row])
+            return None
+
+        ref = str(row['ref']) if row.get('ref') is not None else None
+        serializer = NetworkSupplierImportSerializer(data=row)
+        if not serializer.is_valid():
+            self.add_error(number, serializer.errors, ref)
+            return None
+
+        try:
+            product_ids = sorted(set(parse_id_list(row.get('products'))))
+            parent_id = int(row['supplier']) if row.get('supplier') is not None else None
+        except (TypeError, ValueError):
+            self.add_error(number, ['Идентификаторы поставщика и товаров должны быть целыми числами.'], ref)
+            return None
+        parent_ref = str(row['supplier_ref']) if row.get('supplier_ref') is not None else None
+
+        if not product_ids:
+            self.add_error(number, ['Не выбран ни один продукт'], ref)
+            return None
+        has_parent = parent_id is not None or parent_ref is not None
+        if serializer.validated_data.get('type_supplier', 0) == 0 and has_parent:
+            self.add_error(number, ['Поставщик типа "Завод" не может иметь поставщика.'], ref)
+            return None
+        if serializer.validated_data.get('type_supplier', 0) > 0 and not has_parent:
+            self.add_error(number, ['Если поставщик не "Завод", то он должен иметь поставщика.'], ref)
+            return None
+
+        return ImportRow(number=number, data=serializer.validated_data, product_ids=product_ids, ref=ref,
+                         parent_id=parent_id, parent_ref=parent_ref)
+
+    def import_batch(self, batch: list):
+        """Импорт пакета строк в одной транзакции"""
+        rows = [row for row in (self.parse_row(number, data) for number, data in batch) if row]
+        if not rows:
+            return
+
+        # Существующие родители, существующие товары и наличие товаров у родителей - три запроса на пакет
+        parent_ids = {row.parent_id for row in rows if row.parent_id is not None}
+        product_ids = {product_id for row in rows for product_id in row.product_ids}
+        parents = NetworkSupplier.objects.only('id', 'path', 'level').in_bulk(parent_ids)
+        existing_products = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        available = set(ProductNetworkSupplier.objects.filter(
+            network_supplier__in=parents.keys(), product_id__in=product_ids,
+        ).values_list('network_supplier_id', 'product_id'))
+
+        with transaction.atomic():
+            pending = rows
+            while pending:
+                pending_refs = {row.ref for row in pending if row.ref}
+                wave, deferred = [], []
+                for row in pending:
+                    if row.parent_ref in pending_refs:
+                        # Родитель из этого же пакета ещё не создан - строка попадёт в следующую волну
+                        deferred.append(row)
+                        continue
+                    parent = self.resolve_parent(row, parents, available, existing_products)
+                    if parent is not False:
+                        wave.append((row, parent))
+
+                if not wave:
+                    # Оставшиеся строки ссылаются друг на друга по кругу
+                    for row in deferred:
+                        self.add_error(row.number, ['Циклическая ссылка на поставщика в файле.'], row.ref)
+                    break
+                self.create_wave(wave)
+                pending = deferred
+
+    def resolve_parent(self, row: ImportRow, parents: dict, available: set, existing_products: set):
+        """
+        Поиск родителя строки и проверка наличия у него товаров строки.
+        :return: Родитель, ImportedSupplier, None для завода или False, если строка содержит ошибки.
+        """
+        missing_products = [product_id for product_id in row.product_ids if product_id not in existing_products]
+        if missing_products:
+            self.add_error(row.number, [f'Товары не найдены: {missing_products}.'], row.ref)
+            return False
+
+        if row.parent_ref is not None:
+            if row.parent_ref in self.failed_refs:
+                self.add_error(row.number, [f'Поставщик "{row.parent_ref}" не импортирован из-за ошибок.'], row.ref)
+                return False
+            parent = self.imported.get(row.parent_ref)
+            if parent is None:
+                self.add_error(row.number, [f'Поставщик "{row.parent_ref}" не найден в файле.'], row.ref)
+                return False
+            missing_products = [pid for pid in row.product_ids if pid not in parent.product_ids]
+        elif row.parent_id is not None:
+            supplier = parents.get(row.parent_id)
+            if supplier is None:
+                self.add_error(row.number, [f'Поставщик {row.parent_id} не найден.'], row.ref)
+                return False
+            parent = ImportedSupplier(pk=supplier.pk, path=supplier.path, level=supplier.level)
+            missing_products = [pid for pid in row.product_ids if (supplier.pk, pid) not in available]
+        else:
+            return None
+
+        if missing_products:
+            self.add_error(row.number, [f'У поставщика нет товаров: {missing_products}.'], row.ref)
+            return False
+        return parent
+
+    def create_wave(self, wave: list):
+        """Создание поставщиков одной волны, их путей в иерархии и поставок пакетными запросами"""
+        suppliers = []
+        for row, parent in wave:
+            # Уровень родителя может быть не задан - тогда, как и при переносе поддерева, уровень не вычисляется
+            level = (parent.level + 1 if parent.level is not None else None) if parent else 0
+            suppliers.append(NetworkSupplier(author=self.author, supplier_id=parent.pk if parent else None,
+                                             level=level, **row.data))
+        NetworkSupplier.objects.bulk_create(suppliers)
+
+        links = []
+        for (row, parent), supplier in zip(wave, suppliers):
+            supplier.path = f'{parent.path if parent else ""}{supplier.pk}{PATH_SEPARATOR}'
+            links += [ProductNetworkSupplier(network_supplier=supplier, product_id=product_id, author=self.author)
+                      for product_id in row.product_ids]
+            if row.ref:
+                self.imported[row.ref] = ImportedSupplier(pk=supplier.pk, path=supplier.path, level=supplier.level,
+                                                          product_ids=set(row.product_ids))
+        NetworkSupplier.objects.bulk_update(suppliers, ['path'])
+        ProductNetworkSupplier.objects.bulk_create(links)
+        # Начальная задолженность отражается в журнале задолженности
+        DebtEntry.objects.bulk_create([
+            DebtEntry(network_supplier=supplier, author=self.author, kind=DebtEntry.ADJUSTMENT, amount=supplier.debt)
+            for supplier in suppliers if supplier.debt
+        ])
+        # Агрегаты цепочек: каждый новый поставщик учитывается у себя и у всех вышестоящих одним UPDATE
+        deltas = chain_rollup_deltas((supplier.path, (supplier.debt or 0, 1, len(row.product_ids)))
+                                     for (row, parent), supplier in zip(wave, suppliers))
+        NetworkSupplier.objects.shift_rollups(deltas)
+        # Пакетные вставки не вызывают сигналов - сбрасываем кэш цепочек явно
+        invalidate_network_cache(deltas)
+
+        self.report['created'] += len(suppliers)
+        self.report['links'] += len(links)
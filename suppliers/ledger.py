@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate_network_cache
+from .models import DebtEntry, NetworkSupplier, chain_rollup_deltas, increment_expression
+
+# Журнал задолженности
+LEDGER_BATCH_SIZE = 1000  # количество записей в одной пакетной вставке
+LEDGER_MAX_ENTRIES = 10000  # количество записей, проводимых одним запросом API
+LEDGER_RETENTION_DAYS = 90  # записи старше этого срока сжимаются в снимки
+
+
+@transaction.atomic
+def post_debt_entries(entries: list[DebtEntry]) -> dict[int, Decimal]:
+    """
+    Проведение записей журнала задолженности пакетом фиксированным числом запросов.
+    Записи вставляются пакетной вставкой, а задолженности поставщиков и агрегаты их цепочек
+    изменяются атомарными приращениями F() без чтения и перезаписи значений,
+    поэтому параллельные проводки не теряют изменений.
+    :param entries: Записи журнала (сумма со знаком: начисление > 0, оплата < 0), list[DebtEntry].
+    :return: Изменение задолженности по идентификаторам поставщиков, dict[int, Decimal].
+    """
+    totals = defaultdict(Decimal)
+    for entry in entries:
+        totals[entry.network_supplier_id] += entry.amount
+    if not totals:
+        return {}
+
+    paths = dict(NetworkSupplier.objects.filter(pk__in=totals).values_list('id', 'path'))
+    deltas = chain_rollup_deltas((paths[pk], (amount, 0, 0)) for pk, amount in totals.items())
+    # Строки поставщиков и их цепочек блокируются в порядке id - параллельные пакеты не блокируют друг друга взаимно
+    list(NetworkSupplier.objects.filter(pk__in=deltas).order_by('pk').select_for_update().values_list('pk'))
+
+    DebtEntry.objects.bulk_create(entries, batch_size=LEDGER_BATCH_SIZE)
+    debt_field = NetworkSupplier._meta.get_field('debt')
+    NetworkSupplier.objects.filter(pk__in=totals).update(
+        debt=Coalesce(F('debt'), Value(Decimal(0)), output_field=debt_field) + increment_expression(totals, debt_field))
+    NetworkSupplier.objects.shift_rollups(deltas)
+    invalidate_network_cache(deltas)
+    return dict(totals)
+
+
+def clear_debt(suppliers, author=None) -> int:
+    """
+    Погашение задолженности поставщиков записями оплаты в журнале (вместо обнуления поля).
+    :param suppliers: Поставщики, QuerySet.
+    :param author: Автор записей журнала.
+    :return: Количество проведённых записей, int.
+    """
+    with transaction.atomic():
+        debts = NetworkSupplier.objects.filter(pk__in=suppliers.values('pk')).exclude(debt=0).exclude(
+            debt__isnull=True).order_by('pk').select_for_update().values_list('pk', 'debt')
+        entries = [DebtEntry(network_supplier_id=pk, author=author, kind=DebtEntry.PAYMENT, amount=-debt,
+                             comment='Погашение задолженности') for pk, debt in debts]
+        post_debt_entries(entries)
+    return len(entries)
+
+
+@transaction.atomic
+def compact_debt_entries(before: datetime) -> tuple[int, int]:
+    """
+    Сжатие журнала: записи, проведённые раньше указанного момента, заменяются одним снимком
+    на поставщика с их суммой. Сумма журнала, а значит и задолженность поставщиков, не изменяется.
+    :param before: Момент, раньше которого записи сжимаются, datetime.
+    :return: Количество удалённых записей и созданных снимков, tuple[int, int].
+    """
+    old_entries = DebtEntry.objects.filter(created_at__lt=before)
+    totals = list(old_entries.order_by().values_list('network_supplier').annotate(amount=Sum('amount')))
+    # У записей журнала нет сигналов и зависимых строк - удаляются одним DELETE
+    deleted = old_entries.delete()[0]
+    DebtEntry.objects.bulk_create([
+        DebtEntry(network_supplier_id=pk, kind=DebtEntry.SNAPSHOT, amount=amount, created_at=before,
+                  comment=f'Снимок журнала до {before:%d.%m.%Y %H:%M}')
+        for pk, amount in totals
+    ], batch_size=LEDGER_BATCH_SIZE)
+    return deleted, len(totals)
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from suppliers.ledger import LEDGER_RETENTION_DAYS, compact_debt_entries
+
+
+class Command(BaseCommand):
+    """Сжатие старых записей журнала задолженности в снимки (для периодического запуска)"""
+    help = 'Замена записей журнала задолженности старше заданного срока снимками задолженности поставщиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=LEDGER_RETENTION_DAYS,
+                            help='Срок хранения записей журнала в днях')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('Срок хранения записей не может быть отрицательным.')
+
+        deleted, snapshots = compact_debt_entries(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Сжато записей: {deleted}, создано снимков: {snapshots}.'))
@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand, CommandError
+
+from suppliers.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, SupplierImporter
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Пакетный импорт поставщиков из файла CSV или JSONL"""
+    help = 'Импорт поставщиков и их поставок из файла CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу импорта')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--author', help='Электронная почта автора создаваемых поставщиков')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Количество строк, загружаемых в одной транзакции')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}. Доступные: {", ".join(IMPORT_FORMATS)}.')
+
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError(f'Пользователь {options["author"]} не найден.')
+
+        importer = SupplierImporter(author=author, batch_size=options['batch_size'])
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = importer.run(stream, file_format)
+
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {report["rows"]}, создано поставщиков: {report["created"]}, '
+            f'поставок: {report["links"]}, ошибок: {len(report["errors"])}.'))
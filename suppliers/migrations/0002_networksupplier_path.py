@@ -0,0 +1,51 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+def fill_supplier_paths(apps, schema_editor):
+    """Заполнение материализованных путей существующих поставщиков (от корней цепочек к потомкам)"""
+    NetworkSupplier = apps.get_model("suppliers", "NetworkSupplier")
+    parents = dict(NetworkSupplier.objects.values_list("id", "supplier_id"))
+    paths = {}
+
+    def build_path(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (build_path(parent_id) if parent_id else "") + f"{pk}/"
+        return paths[pk]
+
+    suppliers = []
+    for pk in parents:
+        suppliers.append(NetworkSupplier(id=pk, path=build_path(pk)))
+    NetworkSupplier.objects.bulk_update(suppliers, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networksupplier",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="путь в иерархии",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                fields=["path"],
+                name="supplier_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(fill_supplier_paths, migrations.RunPython.noop),
+    ]
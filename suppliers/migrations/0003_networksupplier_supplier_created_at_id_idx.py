@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0002_networksupplier_path"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                fields=["created_at", "id"], name="supplier_created_at_id_idx"
+            ),
+        ),
+    ]
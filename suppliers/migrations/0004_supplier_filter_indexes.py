@@ -0,0 +1,44 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:46
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0003_networksupplier_supplier_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                django.db.models.functions.text.Upper("country"),
+                django.db.models.functions.text.Upper("city"),
+                name="supplier_country_city_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                django.db.models.functions.text.Upper("city"), name="supplier_city_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                fields=["level", "debt"], name="supplier_level_debt_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(
+                fields=["type_supplier", "debt"], name="supplier_type_debt_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networksupplier",
+            index=models.Index(fields=["debt"], name="supplier_debt_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_supplier_rollups(apps, schema_editor):
+    """Расчёт агрегатов поддеревьев существующих поставщиков по их материализованным путям"""
+    NetworkSupplier = apps.get_model("suppliers", "NetworkSupplier")
+    rollups = {}
+    suppliers = NetworkSupplier.objects.annotate(links=Count("productnetworksupplier"))
+    for path, debt, links in suppliers.values_list("path", "debt", "links"):
+        for pk in path.split("/")[:-1]:
+            rollup = rollups.setdefault(int(pk), [0, 0, 0])
+            rollup[0] += debt or 0
+            rollup[1] += 1
+            rollup[2] += links
+
+    NetworkSupplier.objects.bulk_update(
+        [
+            NetworkSupplier(
+                id=pk,
+                subtree_debt=debt,
+                subtree_suppliers=count,
+                subtree_products=links,
+            )
+            for pk, (debt, count, links) in rollups.items()
+        ],
+        ["subtree_debt", "subtree_suppliers", "subtree_products"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0004_supplier_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networksupplier",
+            name="subtree_debt",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=15,
+                verbose_name="задолженность цепочки",
+            ),
+        ),
+        migrations.AddField(
+            model_name="networksupplier",
+            name="subtree_products",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="поставок в цепочке"
+            ),
+        ),
+        migrations.AddField(
+            model_name="networksupplier",
+            name="subtree_suppliers",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="поставщиков в цепочке"
+            ),
+        ),
+        migrations.RunPython(fill_supplier_rollups, migrations.RunPython.noop),
+    ]
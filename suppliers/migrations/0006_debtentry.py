@@ -0,0 +1,118 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_debt_ledger(apps, schema_editor):
+    """Начальные снимки журнала задолженности: текущая задолженность существующих поставщиков"""
+    NetworkSupplier = apps.get_model("suppliers", "NetworkSupplier")
+    DebtEntry = apps.get_model("suppliers", "DebtEntry")
+    debts = NetworkSupplier.objects.exclude(debt=0).exclude(debt__isnull=True)
+    DebtEntry.objects.bulk_create(
+        [
+            DebtEntry(
+                network_supplier_id=pk,
+                kind="snapshot",
+                amount=debt,
+                comment="Задолженность до ведения журнала",
+            )
+            for pk, debt in debts.values_list("id", "debt")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("suppliers", "0005_networksupplier_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("charge", "Начисление"),
+                            ("payment", "Оплата"),
+                            ("adjustment", "Корректировка"),
+                            ("snapshot", "Снимок"),
+                        ],
+                        max_length=10,
+                        verbose_name="вид записи",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="сумма"
+                    ),
+                ),
+                (
+                    "comment",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=255,
+                        verbose_name="комментарий",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="дата и время проведения",
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="автор",
+                    ),
+                ),
+                (
+                    "network_supplier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="debt_entries",
+                        to="suppliers.networksupplier",
+                        verbose_name="сетевой элемент",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запись журнала задолженности",
+                "verbose_name_plural": "Журнал задолженности",
+                "indexes": [
+                    models.Index(
+                        fields=["network_supplier", "created_at"],
+                        name="debt_entry_supplier_idx",
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="debt_entry_created_at_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(open_debt_ledger, migrations.RunPython.noop),
+    ]
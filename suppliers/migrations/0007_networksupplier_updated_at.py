@@ -0,0 +1,20 @@
+# Generated by Django 4.2.13 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0006_debtentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networksupplier",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, verbose_name="дата и время изменения"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.13 on 2026-10-18 17:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("suppliers", "0007_networksupplier_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productnetworksupplier",
+            name="author",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="автор",
+            ),
+        ),
+    ]
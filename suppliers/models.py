@@ -1,10 +1,149 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Lookup, Subquery, Value, When
+from django.db.models.functions import Concat, Length, Replace, Substr, Upper
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
-from products.models import Product
+from products.models import Product, UpdatedAtQuerySet
 from users.models import User
+from .cache import invalidate_network_cache
 
 NULLABLE = {'blank': True, 'null': True}
 
+# Разделитель идентификаторов в материализованном пути поставщика
+PATH_SEPARATOR = '/'
+
+# Агрегаты поддерева поставщика (сам поставщик и все нижестоящие): задолженность, поставщики, поставки
+ROLLUP_FIELDS = ('subtree_debt', 'subtree_suppliers', 'subtree_products')
+
+
+def path_ids(*paths: str) -> set[int]:
+    """
+    Идентификаторы поставщиков цепочек по их материализованным путям.
+    :param paths: Пути поставщиков, str.
+    :return: Идентификаторы поставщиков и всех вышестоящих, set[int].
+    """
+    return {int(pk) for path in paths for pk in path.split(PATH_SEPARATOR)[:-1]}
+
+
+def path_ancestor_ids(path: str) -> list[int]:
+    """
+    Идентификаторы вышестоящих поставщиков по материализованному пути поставщика.
+    :param path: Путь поставщика, str.
+    :return: Идентификаторы от корня цепочки до непосредственного поставщика, list[int].
+    """
+    return [int(pk) for pk in path.split(PATH_SEPARATOR)[:-2]]
+
+
+def chain_rollup_deltas(changes) -> dict[int, list]:
+    """
+    Приращения агрегатов по цепочкам: изменение поставщика учитывается у него самого и у всех вышестоящих.
+    :param changes: Пары (материализованный путь, приращение (задолженность, поставщики, поставки)), iterable.
+    :return: Суммарные приращения по идентификаторам поставщиков, dict[int, list].
+    """
+    deltas = {}
+    for path, change in changes:
+        for pk in path.split(PATH_SEPARATOR)[:-1]:
+            total = deltas.setdefault(int(pk), [0, 0, 0])
+            for index, value in enumerate(change):
+                total[index] += value
+    return deltas
+
+
+def path_depth_expression(field_name: str = 'path'):
+    """
+    Количество разделителей в материализованном пути поставщика (глубина в цепочке + 1) - выражение для запросов.
+    :param field_name: Поле материализованного пути (в том числе через связь), str.
+    :return: Выражение, вычисляемое в БД.
+    """
+    return Length(field_name) - Length(Replace(field_name, models.Value(PATH_SEPARATOR), models.Value('')))
+
+
+def subtree_condition_sql(path_sql: str, prefix_sql: str) -> tuple[str, tuple]:
+    """
+    SQL-условие вхождения пути в поддерево (путь начинается с префикса - пути вышестоящего или самого поставщика).
+    В отличие от LIKE с шаблоном из столбца, условие записано диапазоном побайтового сравнения (путь начинается
+    с префикса, оканчивающегося разделителем, тогда и только тогда, когда он не меньше префикса и меньше префикса
+    со следующим за разделителем символом), поэтому в соединении используется индекс varchar_pattern_ops по пути.
+    :param path_sql: SQL проверяемого пути, str.
+    :param prefix_sql: SQL пути корня поддерева, str.
+    :return: SQL условия и его параметры, tuple.
+    """
+    return (f'({path_sql} ~>=~ {prefix_sql} AND {path_sql} ~<~ (LEFT({prefix_sql}, -1) || %s))',
+            (chr(ord(PATH_SEPARATOR) + 1),))
+
+
+def delete_without_signals(queryset) -> int:
+    """
+    Удаление строк выборки одним DELETE без загрузки объектов, каскадов и сигналов pre_delete/post_delete.
+    Вызывающий код сам удаляет зависимые строки и поддерживает то, что делают обработчики сигналов
+    (агрегаты цепочек, пути потомков, кэш) - см. NetworkSupplier.delete_chain.
+    :param queryset: Удаляемые строки, QuerySet.
+    :return: Количество удалённых строк, int.
+    """
+    connection = connections[queryset.db]
+    meta = queryset.model._meta
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(meta.db_table)} '
+                       f'WHERE {connection.ops.quote_name(meta.pk.column)} IN ({sql})', params)
+        return cursor.rowcount
+
+
+class InSubtree(Lookup):
+    """Путь входит в поддерево пути правой части (см. subtree_condition_sql) - условие для запросов"""
+    lookup_name = 'in_subtree'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        sql, params = subtree_condition_sql(lhs, rhs)
+        return sql, (*lhs_params, *rhs_params, *lhs_params, *rhs_params, *params)
+
+
+def increment_expression(increments: dict, output_field):
+    """
+    Приращение поля для UPDATE нескольких строк: одно значение, если приращения совпадают, иначе CASE по id.
+    :param increments: Приращения по идентификаторам всех обновляемых строк, dict.
+    :param output_field: Поле модели, определяющее тип выражения.
+    :return: Выражение приращения.
+    """
+    values = set(increments.values())
+    if len(values) == 1:
+        return Value(values.pop(), output_field=output_field)
+    return Case(*[When(pk=pk, then=Value(value)) for pk, value in increments.items() if value],
+                default=Value(0), output_field=output_field)
+
+
+class NetworkSupplierQuerySet(UpdatedAtQuerySet):
+    """Набор запросов поставщиков"""
+
+    def with_products(self):
+        """
+        Поставщики с заранее загруженными поставщиком и товарами (для сериализации без запроса на каждую строку):
+        товары всей выборки загружаются одним дополнительным запросом.
+        """
+        return self.select_related('supplier').prefetch_related(
+            models.Prefetch('products', queryset=Product.objects.only('id', 'title', 'model')))
+
+    def shift_rollups(self, deltas: dict) -> int:
+        """
+        Изменение агрегатов поддеревьев поставщиков на заданные приращения одним UPDATE.
+        :param deltas: Приращения (задолженность, поставщики, поставки) по идентификаторам поставщиков, dict.
+        :return: Количество изменённых поставщиков, int.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return 0
+
+        changes = {}
+        for index, field_name in enumerate(ROLLUP_FIELDS):
+            increments = {pk: delta[index] for pk, delta in deltas.items()}
+            if any(increments.values()):
+                changes[field_name] = F(field_name) + increment_expression(
+                    increments, self.model._meta.get_field(field_name))
+        return self.filter(pk__in=deltas).update(**changes)
+
 
 class NetworkSupplier(models.Model):
     """Модель элемента сети"""
@@ -29,6 +168,27 @@ class NetworkSupplier(models.Model):
     level = models.IntegerField(default=0, verbose_name='уровень', **NULLABLE)
     debt = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='задолженность', **NULLABLE)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата и время создания')
+    # Время изменения поставщика, его агрегатов или товаров (см. обработчики сигналов) - валидатор условных запросов
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='дата и время изменения')
+    # Материализованный путь: идентификаторы поставщиков от корня цепочки до текущего, например "1/5/12/"
+    path = models.CharField(max_length=255, default='', blank=True, editable=False, verbose_name='путь в иерархии')
+    # Агрегаты поддерева (поставщик и все нижестоящие) поддерживаются приращениями при изменении сети
+    subtree_debt = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False,
+                                       verbose_name='задолженность цепочки')
+    subtree_suppliers = models.IntegerField(default=0, editable=False, verbose_name='поставщиков в цепочке')
+    subtree_products = models.IntegerField(default=0, editable=False, verbose_name='поставок в цепочке')
+
+    objects = NetworkSupplierQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Загрузка поставщика из БД с запоминанием сохранённого уровня"""
+        instance = super().from_db(db, field_names, values)
+        # Уровень из БД нужен для пересчёта уровней потомков при его изменении
+        instance._loaded_level = instance.__dict__.get('level')
+        # Задолженность из БД нужна для приращения агрегатов цепочки
+        instance._loaded_debt = instance.__dict__.get('debt')
+        return instance
 
     def save(self, *args, **kwargs):
         """Сохранение поставщиков"""
@@ -40,24 +200,214 @@ class NetworkSupplier(models.Model):
             # В случае, если нет поставщика, уровень остается таким же
             pass
 
-        super(NetworkSupplier, self).save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            # Путь, уровень и задолженность берутся из БД под блокировкой строки: объект в памяти мог устареть
+            # (перенос поставщика или его предка в другом запросе), и устаревший путь читался бы как перемещение
+            stored = None if adding else NetworkSupplier.objects.select_for_update().filter(
+                pk=self.pk).values_list('path', 'level', 'debt').first()
+            if stored:
+                self.path, old_level, stored_debt = stored
+            else:
+                old_level, stored_debt = getattr(self, '_loaded_level', self.level), 0 if adding else self.debt
+            debt_changed = adding or self.debt != getattr(self, '_loaded_debt', stored_debt)
+            debt_delta = (self.debt or 0) - (stored_debt or 0) if debt_changed else 0
+            if adding:
+                self.subtree_debt, self.subtree_suppliers, self.subtree_products = self.debt or 0, 1, 0
+            elif not kwargs.get('update_fields'):
+                # Путь и уровень записываются при синхронизации поддерева, агрегаты и задолженность
+                # (если её не изменяли) изменяются только приращениями в БД - не перезаписываем их значениями из памяти
+                skip_fields = ROLLUP_FIELDS + ('path', 'level') + (() if debt_changed else ('debt',))
+                kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                           if not field.primary_key and field.name not in skip_fields]
+            old_path = self.path
+            new_path = self.build_path() if old_path else old_path
+            if new_path != old_path and new_path.startswith(old_path):
+                # Новый вышестоящий поставщик находится в поддереве сохраняемого - путь замкнулся бы в цикл
+                raise ValidationError('Нельзя переместить поставщика в его собственную цепочку.')
+
+            super(NetworkSupplier, self).save(*args, **kwargs)
+            self.update_subtree(old_level)
+            self.update_rollups(adding, old_path, debt_delta)
+            if debt_delta:
+                # Задолженность, заданная напрямую, отражается в журнале корректировкой
+                DebtEntry.objects.create(network_supplier=self, author=self.author, kind=DebtEntry.ADJUSTMENT,
+                                         amount=debt_delta)
+            self._loaded_level, self._loaded_debt = self.level, self.debt
+
+            # Сброс кэша старой и новой цепочек, а при переносе или смене уровня - и всего поддерева
+            changed_ids = path_ids(old_path, self.path)
+            if old_path and (old_path != self.path or old_level != self.level):
+                changed_ids.update(
+                    NetworkSupplier.objects.filter(path__startswith=self.path).values_list('pk', flat=True))
+            invalidate_network_cache(changed_ids)
 
-    def delete_chain(self):
-        """Удаление поставщиков"""
-        # Получаем всех поставщиков, которые следуют за текущим поставщиком по цепочке
-        suppliers_to_delete = NetworkSupplier.objects.filter(supplier=self)
+    def build_path(self) -> str:
+        """
+        Формирование материализованного пути поставщика по пути его родителя.
+        :return: Путь в иерархии, str.
+        """
+        parent_path = self.supplier.path if self.supplier else ''
+        return f'{parent_path}{self.pk}{PATH_SEPARATOR}'
 
-        # Удаляем товары текущего поставщика у следующих по цепочке поставщиков и удаляем их
-        for supplier in suppliers_to_delete:
-            # Проверяем уровень поставщика
-            if supplier.level > self.level:
-                # Удаление связи между объектом supplier и товарами
-                # для удаления всех товаров, связанных с поставщиком
-                supplier.products.clear()
-                # Рекурсивный вызов для удаления цепочки поставщиков
-                supplier.delete_chain()
+    def update_subtree(self, old_level: int | None = None):
+        """
+        Синхронизация материализованного пути и уровней поставщика и всех его потомков.
+        Поддерево переписывается одним UPDATE: префикс старого пути заменяется на новый,
+        а уровень потомка пересчитывается от уровня текущего поставщика по разнице глубин в пути.
+        :param old_level: Уровень поставщика до сохранения, int.
+        """
+        old_path, new_path = self.path, self.build_path()
+        if old_path != new_path or old_level != self.level:
+            NetworkSupplier.objects.filter(pk=self.pk).update(path=new_path, level=self.level)
+            self.path = new_path
 
-        self.delete()  # Удаляем текущего поставщика
+        if old_path and (old_path != new_path or old_level != self.level):
+            # Поставщика перенесли в другую цепочку или изменили его тип - переносим вместе с ним всё поддерево
+            changes = {'path': Concat(models.Value(new_path), Substr('path', len(old_path) + 1))}
+            if self.level is not None:
+                # Глубина потомка - количество разделителей в его (ещё не переписанном) пути
+                changes['level'] = path_depth_expression() + (self.level - old_path.count(PATH_SEPARATOR))
+            NetworkSupplier.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(**changes)
+
+    def update_rollups(self, adding: bool, old_path: str, debt_delta=0):
+        """
+        Приращение агрегатов цепочки после сохранения поставщика (одним UPDATE):
+        новый поставщик добавляется к вышестоящим, изменение задолженности - к себе и вышестоящим,
+        при перемещении агрегаты поддерева вычитаются из старой цепочки и добавляются к новой.
+        :param adding: Флаг, указывающий на то, что поставщик создан, bool.
+        :param old_path: Путь в иерархии до сохранения, str.
+        :param debt_delta: Изменение задолженности поставщика.
+        """
+        if adding:
+            deltas = chain_rollup_deltas([(self.path, (self.subtree_debt, 1, 0))])
+            del deltas[self.pk]
+            NetworkSupplier.objects.shift_rollups(deltas)
+            return
+
+        if not old_path or old_path == self.path:
+            NetworkSupplier.objects.shift_rollups(chain_rollup_deltas([(self.path, (debt_delta, 0, 0))]))
+            return
+
+        # Перемещение: переносим агрегаты поддерева (до изменения задолженности) из старой цепочки в новую
+        self.refresh_from_db(fields=ROLLUP_FIELDS)
+        rollup = (self.subtree_debt, self.subtree_suppliers, self.subtree_products)
+        own_segment = len(f'{self.pk}{PATH_SEPARATOR}')
+        deltas = chain_rollup_deltas([
+            (old_path[:-own_segment], [-value for value in rollup]),
+            (self.path[:-own_segment], rollup),
+            (self.path, (debt_delta, 0, 0)),
+        ])
+        NetworkSupplier.objects.shift_rollups(deltas)
+        self.subtree_debt += debt_delta
+
+    def shift_chain_rollups(self, debt=0, suppliers: int = 0, products: int = 0):
+        """
+        Приращение агрегатов поставщика и всех вышестоящих (например, после пакетного изменения поставок).
+        :param debt: Приращение задолженности.
+        :param suppliers: Приращение количества поставщиков, int.
+        :param products: Приращение количества поставок, int.
+        """
+        NetworkSupplier.objects.shift_rollups(chain_rollup_deltas([(self.path, (debt, suppliers, products))]))
+        invalidate_network_cache(path_ids(self.path))
+
+    def remove_from_rollups(self):
+        """
+        Вычитание агрегатов поддерева удаляемого поставщика из агрегатов вышестоящих одним UPDATE
+        (значения агрегатов берутся из БД подзапросом, а не из возможно устаревшего объекта).
+        """
+        ancestor_ids = self.get_ancestor_ids()
+        if ancestor_ids:
+            rollup = NetworkSupplier.objects.filter(pk=self.pk)
+            NetworkSupplier.objects.filter(pk__in=ancestor_ids).update(
+                **{field_name: F(field_name) - Subquery(rollup.values(field_name)) for field_name in ROLLUP_FIELDS})
+
+    def remove_deleted_from_rollups(self, rollup):
+        """
+        Вычитание агрегатов поддерева удалённого поставщика (прочитанных до удаления) из агрегатов вышестоящих.
+        Если тем же удалением (удаление набора, каскадное удаление) удалены и вышестоящие, поддерево уже
+        вычтено при удалении ближайшего из них, поэтому агрегаты изменяются только у вышестоящих ниже него.
+        :param rollup: Агрегаты поддерева до удаления (задолженность, поставщики, поставки), tuple.
+        """
+        ancestor_ids = self.get_ancestor_ids()
+        if not ancestor_ids or rollup is None:
+            return
+        existing = set(NetworkSupplier.objects.filter(pk__in=ancestor_ids).values_list('pk', flat=True))
+        deleted = [index for index, pk in enumerate(ancestor_ids) if pk not in existing]
+        if deleted:
+            ancestor_ids = ancestor_ids[deleted[-1] + 1:]
+        if ancestor_ids:
+            NetworkSupplier.objects.filter(pk__in=ancestor_ids).update(
+                **{field_name: F(field_name) - value for field_name, value in zip(ROLLUP_FIELDS, rollup)})
+
+    def detach_descendants(self):
+        """
+        Перестроение путей потомков после удаления поставщика: его дочерние элементы
+        становятся корнями своих цепочек (связь supplier обнуляется через SET_NULL).
+        """
+        if self.path:
+            NetworkSupplier.objects.filter(path__startswith=self.path).exclude(pk=self.pk).update(
+                path=Substr('path', len(self.path) + 1))
+
+    def get_ancestor_ids(self) -> list[int]:
+        """
+        Идентификаторы вышестоящих поставщиков из материализованного пути (без обращения к БД).
+        :return: Идентификаторы от корня цепочки до непосредственного поставщика, list[int].
+        """
+        return path_ancestor_ids(self.path)
+
+    def is_in_subtree_of(self, supplier) -> bool:
+        """
+        Проверка, что поставщик - сам supplier или его нижестоящий (по материализованным путям, без обращения к БД).
+        Такой поставщик не может стать вышестоящим для supplier: цепочка замкнулась бы в цикл.
+        :param supplier: Корень проверяемого поддерева, NetworkSupplier.
+        :return: Результат проверки, bool.
+        """
+        return self.pk == supplier.pk or bool(supplier.path) and self.path.startswith(supplier.path)
+
+    def get_ancestors(self):
+        """Вышестоящие поставщики в порядке от корня цепочки (один запрос по первичному ключу)"""
+        return NetworkSupplier.objects.filter(pk__in=self.get_ancestor_ids()).order_by(Length('path'))
+
+    def get_descendants(self, include_self: bool = False):
+        """
+        Нижестоящие поставщики (один запрос по индексу префикса пути).
+        :param include_self: Флаг, указывающий на то, что текущий поставщик включается в выборку, bool.
+        """
+        descendants = NetworkSupplier.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+    @property
+    def depth(self) -> int:
+        """Глубина поставщика в цепочке (0 - корень цепочки)"""
+        return len(self.get_ancestor_ids())
+
+    @transaction.atomic
+    def delete_chain(self) -> tuple[int, int]:
+        """
+        Удаление поставщика вместе со всей цепочкой нижестоящих поставщиков и их поставками.
+        Поддерево выбирается по префиксу материализованного пути, поэтому удаление выполняется
+        фиксированным числом запросов независимо от размера цепочки.
+        :return: Количество удалённых поставщиков и поставок (связей с товарами), tuple[int, int].
+        """
+        if not self.path:
+            # Путь не заполнен - пустой префикс совпал бы со всеми поставщиками
+            self.update_subtree()
+        self.remove_from_rollups()
+
+        subtree = self.get_descendants(include_self=True)
+        links = ProductNetworkSupplier.objects.filter(network_supplier__path__startswith=self.path)
+        debt_entries = DebtEntry.objects.filter(network_supplier__path__startswith=self.path)
+        # Удаляем связи поставщиков цепочки с товарами и журнал их задолженности (у них нет сигналов и зависимых
+        # строк - удаляются одним DELETE), затем самих поставщиков без поштучного сбора объектов и сигналов.
+        # Пропуск сигналов поставщиков безопасен: агрегаты вышестоящих уже уменьшены remove_from_rollups(),
+        # перестраивать пути потомков не нужно, так как удаляется всё поддерево, а кэш удаляемых поставщиков
+        # и их вышестоящих сбрасывается явно
+        invalidate_network_cache([*self.get_ancestor_ids(), *subtree.values_list('pk', flat=True)])
+        links_deleted = links.delete()[0]
+        debt_entries.delete()
+        suppliers_deleted = delete_without_signals(subtree)
+        return suppliers_deleted, links_deleted
 
     def __str__(self):
         return f'{self.name}, уровень: {self.level}'
@@ -65,18 +415,91 @@ class NetworkSupplier(models.Model):
     class Meta:
         verbose_name = 'Поставщик'
         verbose_name_plural = 'Поставщики'
+        indexes = [
+            # varchar_pattern_ops позволяет PostgreSQL использовать индекс для LIKE 'префикс%'
+            models.Index(fields=['path'], name='supplier_path_idx', opclasses=['varchar_pattern_ops']),
+            # Ключ курсорной пагинации списка поставщиков
+            models.Index(fields=['created_at', 'id'], name='supplier_created_at_id_idx'),
+            # Фильтры по стране и городу без учёта регистра (iexact -> UPPER(...) = UPPER(...))
+            models.Index(Upper('country'), Upper('city'), name='supplier_country_city_idx'),
+            models.Index(Upper('city'), name='supplier_city_idx'),
+            # Фильтры по уровню и типу поставщика, в т.ч. вместе с диапазоном задолженности
+            models.Index(fields=['level', 'debt'], name='supplier_level_debt_idx'),
+            models.Index(fields=['type_supplier', 'debt'], name='supplier_type_debt_idx'),
+            models.Index(fields=['debt'], name='supplier_debt_idx'),
+        ]
 
 
 class ProductNetworkSupplier(models.Model):
     """Модель для установления связи многие ко многим между моделями Product и NetworkSupplier"""
-    author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='автор', **NULLABLE)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, verbose_name='автор', **NULLABLE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='продукт')
     network_supplier = models.ForeignKey(NetworkSupplier, on_delete=models.CASCADE, verbose_name='сетевой элемент')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата и время создания')
 
+    def save(self, *args, **kwargs):
+        """Сохранение поставки с учётом новой поставки в агрегатах цепочки поставщика"""
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            self.network_supplier.shift_chain_rollups(products=1)
+
+    def delete(self, *args, **kwargs):
+        """Удаление поставки с вычитанием её из агрегатов цепочки поставщика"""
+        self.network_supplier.shift_chain_rollups(products=-1)
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f'{self.product}: поставщик {self.network_supplier}'
 
     class Meta:
         verbose_name = 'Поставка'
         verbose_name_plural = 'Поставки'
+
+
+class DebtEntry(models.Model):
+    """
+    Запись журнала задолженности поставщика. Журнал только дополняется: задолженность поставщика -
+    кэшированная сумма его записей, изменяемая атомарными приращениями при проведении записей.
+    """
+    CHARGE = 'charge'
+    PAYMENT = 'payment'
+    ADJUSTMENT = 'adjustment'
+    SNAPSHOT = 'snapshot'
+    KIND_CHOICES = (
+        (CHARGE, 'Начисление'),
+        (PAYMENT, 'Оплата'),
+        (ADJUSTMENT, 'Корректировка'),
+        (SNAPSHOT, 'Снимок'),
+    )
+    network_supplier = models.ForeignKey(NetworkSupplier, on_delete=models.CASCADE, related_name='debt_entries',
+                                         verbose_name='сетевой элемент')
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, verbose_name='автор', **NULLABLE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='вид записи')
+    # Сумма со знаком: начисление увеличивает задолженность, оплата - уменьшает
+    amount = models.DecimalField(max_digits=15, decimal_places=2, verbose_name='сумма')
+    comment = models.CharField(max_length=255, blank=True, default='', verbose_name='комментарий')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='дата и время проведения')
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.amount}: {self.network_supplier_id}'
+
+    class Meta:
+        verbose_name = 'Запись журнала задолженности'
+        verbose_name_plural = 'Журнал задолженности'
+        indexes = [
+            # История поставщика и сжатие старых записей
+            models.Index(fields=['network_supplier', 'created_at'], name='debt_entry_supplier_idx'),
+            models.Index(fields=['created_at'], name='debt_entry_created_at_idx'),
+        ]
+
+
+def shift_links_rollups(links, sign: int):
+    """
+    Учёт поставок в агрегатах цепочек их поставщиков (для пакетных изменений поставок без сигналов).
+    :param links: Набор поставок, QuerySet.
+    :param sign: 1 - поставки добавлены, -1 - поставки удаляются, int.
+    """
+    paths = list(links.values_list('network_supplier__path', flat=True))
+    NetworkSupplier.objects.shift_rollups(chain_rollup_deltas((path, (0, 0, sign)) for path in paths))
+    invalidate_network_cache(path_ids(*paths))
@@ -1,7 +1,15 @@
 from rest_framework.pagination import PageNumberPagination
+from products.pagination import KeysetPaginationMixin
 
 
-class SupplierPagination(PageNumberPagination):
+class SupplierPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 10
     page_query_param = 'page_size'
     max_page_size = 10
+    keyset_ordering = ('created_at', 'id')
+
+
+class ReachabilityPagination(PageNumberPagination):
+    page_size = 50
+    # Номер страницы передаётся тем же параметром, что и в остальных списках API
+    page_query_param = 'page_size'
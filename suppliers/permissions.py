@@ -10,4 +10,5 @@ class IsAuthor(BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user
+        # Сравнение идентификаторов не загружает автора объекта из БД
+        return obj.author_id == request.user.pk
@@ -1,5 +1,8 @@
+from decimal import Decimal
+
+from products.models import Product
 from users.serializers import CurrentUserSerializer
-from .models import NetworkSupplier
+from .models import DebtEntry, NetworkSupplier
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
@@ -13,6 +16,7 @@ class NetworkSupplierSerializer(serializers.ModelSerializer):
 
     def get_products(self, obj):
         """ Получение списка товаров создаваемого поставщика вместо их id """
+        # obj.products.all() использует товары, заранее загруженные через prefetch_related, если они есть
         products_list = [f'{product.id}) {product.title} - {product.model}' for product in obj.products.all()]
         products_list.sort()
         return products_list
@@ -26,9 +30,93 @@ class NetworkSupplierSerializer(serializers.ModelSerializer):
             raise ValidationError('Поставщик типа "Завод" не может иметь поставщика.')
         if type_supplier > 0 and not supplier:
             raise ValidationError('Если поставщик не "Завод", то он должен иметь поставщика.')
+        if supplier and self.instance is not None and supplier.is_in_subtree_of(self.instance):
+            raise ValidationError('Нельзя переместить поставщика в его собственную цепочку.')
 
         return attrs
 
     class Meta:
         model = NetworkSupplier
-        fields = '__all__'
+        # Материализованный путь - внутреннее представление иерархии, цепочку задаёт поле supplier
+        exclude = ('path',)
+        # Задолженность изменяется только проведением записей журнала задолженности,
+        # агрегаты цепочки и время изменения поддерживаются самой моделью
+        read_only_fields = ('debt', 'subtree_debt', 'subtree_suppliers', 'subtree_products', 'updated_at')
+
+
+class NetworkSupplierMoveSerializer(serializers.ModelSerializer):
+    """ Сериализатор перемещения поставщика вместе с его цепочкой к новому поставщику """
+    supplier = serializers.SlugRelatedField(slug_field='id', queryset=NetworkSupplier.objects.all())
+
+    def validate_supplier(self, supplier):
+        """ Проверка нового поставщика и наличия у него всех товаров перемещаемого поставщика """
+        instance = self.instance
+        if instance.type_supplier == 0:
+            raise ValidationError('Поставщик типа "Завод" не может иметь поставщика.')
+        if supplier.is_in_subtree_of(instance):
+            raise ValidationError('Нельзя переместить поставщика в его собственную цепочку.')
+
+        # Товары перемещаемого поставщика, которых нет у нового поставщика (один запрос)
+        missing_products = Product.objects.filter(network_suppliers=instance).exclude(
+            network_suppliers=supplier).order_by('id')
+        if missing_products:
+            products_list = ' | '.join([f'{product.id} - {product}' for product in missing_products])
+            raise ValidationError(f'У нового поставщика нет товаров: {products_list}.')
+
+        return supplier
+
+    class Meta:
+        model = NetworkSupplier
+        fields = ('id', 'name', 'supplier', 'level')
+        read_only_fields = ('name', 'level')
+
+
+class ReachableSupplierSerializer(serializers.ModelSerializer):
+    """ Сериализатор поставщика, который может получить товар по своей цепочке """
+    # Расстояние до ближайшего поставщика цепочки, у которого есть товар (0 - товар есть у самого поставщика)
+    distance = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = NetworkSupplier
+        fields = ('id', 'name', 'country', 'city', 'level', 'distance')
+
+
+class NetworkSupplierImportSerializer(serializers.ModelSerializer):
+    """ Сериализатор проверки полей поставщика при пакетном импорте (без обращений к БД) """
+
+    class Meta:
+        model = NetworkSupplier
+        fields = ('name', 'email', 'phone', 'country', 'city', 'street', 'house_number', 'type_supplier', 'debt')
+
+
+class NetworkSupplierRollupSerializer(serializers.ModelSerializer):
+    """ Сериализатор агрегатов цепочки поставщика (хранятся в поставщике, без обхода иерархии) """
+    descendants_count = serializers.SerializerMethodField()
+
+    def get_descendants_count(self, obj):
+        """ Количество нижестоящих поставщиков (агрегат включает самого поставщика) """
+        return obj.subtree_suppliers - 1
+
+    class Meta:
+        model = NetworkSupplier
+        fields = ('id', 'name', 'level', 'debt', 'subtree_debt', 'descendants_count', 'subtree_products')
+
+
+class DebtByLevelSerializer(serializers.Serializer):
+    """ Сериализатор задолженности уровня иерархии """
+    level = serializers.IntegerField()
+    suppliers = serializers.IntegerField()
+    debt = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+
+class DebtEntrySerializer(serializers.ModelSerializer):
+    """ Сериализатор записи журнала задолженности (проверка полей без обращений к БД) """
+    network_supplier = serializers.IntegerField(source='network_supplier_id')
+    kind = serializers.ChoiceField(choices=DebtEntry.KIND_CHOICES[:2])
+    # Сумма передаётся положительной, знак определяется видом записи; разрядность - как у задолженности поставщика
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+
+    class Meta:
+        model = DebtEntry
+        fields = ('network_supplier', 'kind', 'amount', 'comment')
+
@@ -1,5 +1,26 @@
+import csv
+import json
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Sum, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
 from products.models import Product
-from suppliers.models import ProductNetworkSupplier, NetworkSupplier
+from suppliers.models import InSubtree, ProductNetworkSupplier, NetworkSupplier, path_ancestor_ids, \
+    path_depth_expression, subtree_condition_sql
+
+# Ограничения размера отчёта о недоступных товарах
+MISSING_PRODUCTS_LIMIT = 50  # количество товаров в отчёте
+ALTERNATIVE_SUPPLIERS_LIMIT = 5  # количество альтернативных поставщиков на один товар
+AVAILABLE_PRODUCTS_LIMIT = 20  # количество товаров, доступных у выбранного поставщика
+
+# Выгрузка сети поставщиков
+EXPORT_CHUNK_SIZE = 2000  # количество строк, получаемых из курсора БД за один раз
+EXPORT_FIELDS = ('id', 'name', 'email', 'phone', 'country', 'city', 'street', 'house_number', 'type_supplier',
+                 'level', 'debt', 'supplier_id', 'created_at')
 
 
 class SupplierService:
@@ -16,46 +37,157 @@ class SupplierService:
                                                                          author=request_user)
         product_network_supplier.save()
 
+    @staticmethod
+    @transaction.atomic
+    def create_supplier(serializer, product_ids: list[int], request_user) -> NetworkSupplier:
+        """
+        Создание поставщика и его поставок в одной транзакции:
+        одно сохранение сериализатора и одна пакетная вставка связей с товарами.
+        :param serializer: Проверенный сериализатор поставщика.
+        :param product_ids: Идентификаторы товаров поставщика, list[int].
+        :param request_user: Автор поставщика и поставок.
+        :return: Созданный поставщик, NetworkSupplier.
+        """
+        network_supplier = serializer.save(author=request_user)
+        ProductNetworkSupplier.objects.bulk_create([
+            ProductNetworkSupplier(network_supplier=network_supplier, product_id=product_id, author=request_user)
+            for product_id in product_ids
+        ])
+        # Пакетная вставка не вызывает сигналов - учитываем поставки в агрегатах цепочки явно
+        network_supplier.shift_chain_rollups(products=len(product_ids))
+        return network_supplier
+
+    @staticmethod
+    @transaction.atomic
+    def update_supplier(serializer, add_product_ids: list[int], delete_product_ids: list[int],
+                        request_user) -> NetworkSupplier:
+        """
+        Изменение поставщика и применение разницы его товаров в одной транзакции:
+        одно сохранение сериализатора, одна пакетная вставка и одно удаление связей с товарами.
+        :param serializer: Проверенный сериализатор поставщика.
+        :param add_product_ids: Идентификаторы добавляемых товаров, list[int].
+        :param delete_product_ids: Идентификаторы удаляемых товаров, list[int].
+        :param request_user: Автор поставщика и поставок.
+        :return: Изменённый поставщик, NetworkSupplier.
+        """
+        network_supplier = serializer.save(author=request_user)
+        links_delta = 0
+        if add_product_ids:
+            links_delta += len(ProductNetworkSupplier.objects.bulk_create([
+                ProductNetworkSupplier(network_supplier=network_supplier, product_id=product_id, author=request_user)
+                for product_id in add_product_ids
+            ]))
+        if delete_product_ids:
+            links_delta -= ProductNetworkSupplier.objects.filter(network_supplier=network_supplier,
+                                                                 product__in=delete_product_ids).delete()[0]
+        # Пакетные изменения поставок не вызывают сигналов - учитываем их в агрегатах цепочки явно
+        network_supplier.shift_chain_rollups(products=links_delta)
+        return network_supplier
 
-def find_suppliers_with_product(product: str, product_id: int) -> str:
+
+def prefetch_supplier_chains(suppliers) -> list[NetworkSupplier]:
+    """
+    Загрузка цепочек вышестоящих поставщиков для набора поставщиков одним запросом.
+    Каждому поставщику присваивается атрибут supplier_chain - список поставщиков от корня цепочки
+    до непосредственного поставщика (по материализованному пути).
+    :param suppliers: Поставщики, например, страница списка, list[NetworkSupplier].
+    :return: Те же поставщики с заполненными цепочками, list[NetworkSupplier].
+    """
+    suppliers = list(suppliers)
+    ancestor_ids = {pk for supplier in suppliers for pk in supplier.get_ancestor_ids()}
+    ancestors = NetworkSupplier.objects.only('id', 'name', 'path').in_bulk(ancestor_ids) if ancestor_ids else {}
+    for supplier in suppliers:
+        supplier.supplier_chain = [ancestors[pk] for pk in supplier.get_ancestor_ids() if pk in ancestors]
+    return suppliers
+
+
+def find_reachable_suppliers(product_id: int, city: str | None = None, max_depth: int | None = None):
     """
-    Проверка наличия товаров у других поставщиков, если у текущего нет.
-    :param product: Продукт, str.
-    :param product_id: Идентификатор товара, int
-    :return: Сообщение, str.
+    Поставщики, которые могут получить товар по своей цепочке: сами имеют его или его имеет один из вышестоящих.
+    Выборка строится одним запросом постоянного размера без обхода иерархии в Python: держатели товара находятся
+    по индексу поставок, их поддеревья - соединением по индексу материализованного пути, а расстояние
+    до ближайшего держателя вычисляется в БД как разность глубин путей.
+    :param product_id: Идентификатор товара, int.
+    :param city: Город поставщика (без учёта регистра), str.
+    :param max_depth: Наибольшее расстояние до держателя товара (0 - товар есть у самого поставщика), int.
+    :return: Поставщики с расстоянием distance в порядке его возрастания, QuerySet.
     """
-    suppliers_with_product = NetworkSupplier.objects.filter(products=product)
-    suppliers_list = ' | '.join([str(supplier) for supplier in suppliers_with_product])
-    message_suppliers = (f"Вы можете создать новую поставку "
-                         f"и выбрать '{product_id} - {product}' у одного из поставщиков: "
-                         f"{suppliers_list}." if suppliers_list else "Ни у одного из поставщиков нет указанного товара.")
-    return message_suppliers
+    # Поддеревья держателей товара: от поставок товара к поставщикам соединением по диапазону путей
+    subtree_sql, subtree_params = subtree_condition_sql('supplier.path', 'holder.path')
+    reachable_ids = RawSQL(
+        f'SELECT supplier.id FROM {ProductNetworkSupplier._meta.db_table} link '
+        f'JOIN {NetworkSupplier._meta.db_table} holder ON holder.id = link.network_supplier_id '
+        f'JOIN {NetworkSupplier._meta.db_table} supplier ON {subtree_sql} WHERE link.product_id = %s',
+        (*subtree_params, product_id))
+    # Ближайший держатель цепочки поставщика (он сам или вышестоящий) - самый глубокий из них
+    holder_depth = ProductNetworkSupplier.objects.filter(
+        InSubtree(OuterRef('path'), F('network_supplier__path')), product_id=product_id).order_by().values(
+        'product_id').annotate(depth=Max(path_depth_expression('network_supplier__path'))).values('depth')
+    suppliers = NetworkSupplier.objects.filter(pk__in=reachable_ids).annotate(
+        distance=path_depth_expression() - Subquery(holder_depth, output_field=IntegerField()))
+    if city:
+        suppliers = suppliers.filter(city__iexact=city)
+    if max_depth is not None:
+        suppliers = suppliers.filter(distance__lte=max_depth)
+    return suppliers.order_by('distance', 'id')
 
 
-def find_products_for_supplier(supplier: str) -> str:
+def find_missing_products(supplier: NetworkSupplier, product_ids: list[int]) -> list[Product]:
     """
-    Проверка наличия доступных товаров у выбранного поставщика
-    :param supplier: Поставщик товара, str.
-    :return: Сообщение, str.
+    Поиск товаров, которых нет у поставщика (два запроса независимо от количества товаров).
+    :param supplier: Поставщик товара, NetworkSupplier.
+    :param product_ids: Идентификаторы проверяемых товаров, list[int].
+    :return: Отсутствующие у поставщика товары в порядке идентификаторов, list[Product].
     """
-    product_with_supplier = Product.objects.filter(network_suppliers=supplier)
-    products_list = ' | '.join([f'{product.id} - {str(product)}' for product in product_with_supplier])
-    message_products = (f"Товары, доступные у выбранного поставщика: {products_list}."
-                        if products_list else "У выбранного поставщика товаров нет.")
-    return message_products
+    available_ids = set(supplier.products.filter(id__in=product_ids).values_list('id', flat=True))
+    missing_ids = [product_id for product_id in product_ids if product_id not in available_ids]
+    if not missing_ids:
+        return []
+    products = Product.objects.in_bulk(missing_ids)
+    return [products[product_id] for product_id in missing_ids if product_id in products]
 
 
-def check_product_existence(supplier: str, product_id: int, product: str) -> str:
+def build_availability_report(supplier: NetworkSupplier, missing_products: list[Product]) -> dict:
     """
-    Формирование сообщения об ошибке.
-    :param supplier: Поставщик товара, str.
-    :param product_id: Идентификатор товара, int
-    :param product: Продукт, str
-    :return: Сообщение об ошибке, str.
+    Формирование отчёта об отсутствующих у поставщика товарах фиксированным числом запросов
+    независимо от количества товаров и размера сети. Размер отчёта ограничен: для каждого товара
+    приводятся не более ALTERNATIVE_SUPPLIERS_LIMIT поставщиков (ближайших к заводу) и их общее количество.
+    :param supplier: Поставщик товара, NetworkSupplier.
+    :param missing_products: Отсутствующие у поставщика товары, list[Product].
+    :return: Отчёт, dict.
     """
-    message_suppliers = find_suppliers_with_product(product, product_id)
-    message_products = find_products_for_supplier(supplier)
-    return f'У поставщика нет товара "{product_id} - {product}". {message_suppliers} {message_products}'
+    reported_products = missing_products[:MISSING_PRODUCTS_LIMIT]
+
+    # Альтернативные поставщики всех товаров одним запросом: нумерация внутри товара и общее количество
+    alternatives = ProductNetworkSupplier.objects.filter(
+        product__in=reported_products,
+    ).annotate(
+        position=Window(RowNumber(), partition_by=[F('product_id')],
+                        order_by=[F('network_supplier__level').asc(), F('network_supplier_id').asc()]),
+        total=Window(Count('id'), partition_by=[F('product_id')]),
+    ).filter(
+        position__lte=ALTERNATIVE_SUPPLIERS_LIMIT,
+    ).values('product_id', 'total', 'network_supplier_id', 'network_supplier__name', 'network_supplier__level')
+
+    suppliers_by_product = {product.id: {'suppliers': [], 'suppliers_count': 0} for product in reported_products}
+    for row in alternatives:
+        suppliers = suppliers_by_product[row['product_id']]
+        suppliers['suppliers_count'] = row['total']
+        suppliers['suppliers'].append({'id': row['network_supplier_id'], 'name': row['network_supplier__name'],
+                                       'level': row['network_supplier__level']})
+
+    available_products = supplier.products.order_by('id')
+    return {
+        'missing_products': [{
+            'message': f'У поставщика нет товара "{product.id} - {product}".',
+            'product': {'id': product.id, 'name': str(product)},
+            **suppliers_by_product[product.id],
+        } for product in reported_products],
+        'missing_products_count': len(missing_products),
+        'available_products': [{'id': product.id, 'name': str(product)}
+                               for product in available_products[:AVAILABLE_PRODUCTS_LIMIT]],
+        'available_products_count': available_products.count(),
+    }
 
 
 def check_product_ids(product_ids: list[int], update_supplier: bool = False) -> tuple[list[int], list[int]]:
@@ -80,9 +212,64 @@ def check_product_ids(product_ids: list[int], update_supplier: bool = False) ->
         product_ids = list(set([abs(product_id) for product_id in product_ids if product_id != 0]))
         product_ids.sort()
 
-        # Получаем список всех имеющихся id продуктов из модели Product
-        products_ids = Product.objects.values_list('id', flat=True)
+        # Получаем множество id продуктов из модели Product, но только среди запрошенных (поиск по первичному ключу)
+        products_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True)) \
+            if product_ids else set()
         # Оставляем только те id, которые есть в Product, чтобы исключить ошибку, вызываемую несуществующим id
         product_ids = [prod_id for prod_id in product_ids if prod_id in products_ids]
 
     return product_ids, product_delete_ids
+
+
+class _EchoBuffer:
+    """Псевдобуфер для csv.writer: возвращает записанную строку вместо накопления"""
+
+    def write(self, value):
+        return value
+
+
+def iter_supplier_export():
+    """
+    Построчная выгрузка всей сети поставщиков через серверный курсор БД:
+    в памяти одновременно находится не более EXPORT_CHUNK_SIZE строк.
+    Цепочка вышестоящих поставщиков берётся из материализованного пути,
+    идентификаторы товаров - подзапросом по индексу связи с поставщиком.
+    :return: Генератор словарей с данными поставщиков.
+    """
+    product_ids = ProductNetworkSupplier.objects.filter(
+        network_supplier=OuterRef('pk')).order_by('product_id').values('product_id')
+    suppliers = NetworkSupplier.objects.order_by('id').annotate(
+        product_ids=ArraySubquery(product_ids)).values(*EXPORT_FIELDS, 'path', 'product_ids')
+
+    for supplier in suppliers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        path = supplier.pop('path')
+        supplier['phone'] = str(supplier['phone'])
+        supplier['chain'] = path_ancestor_ids(path)
+        yield supplier
+
+
+def stream_supplier_export_ndjson():
+    """Выгрузка сети поставщиков в формате NDJSON: одна строка JSON на поставщика"""
+    for supplier in iter_supplier_export():
+        yield json.dumps(supplier, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def stream_supplier_export_csv():
+    """Выгрузка сети поставщиков в формате CSV: списки идентификаторов разделяются пробелом"""
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow([*EXPORT_FIELDS, 'chain', 'product_ids'])
+    for supplier in iter_supplier_export():
+        yield writer.writerow([*(supplier[field] for field in EXPORT_FIELDS),
+                               ' '.join(map(str, supplier['chain'])),
+                               ' '.join(map(str, supplier['product_ids']))])
+
+
+def debt_by_level(supplier: NetworkSupplier | None = None) -> list[dict]:
+    """
+    Задолженность и количество поставщиков по уровням иерархии одним агрегирующим запросом
+    (по индексу (level, debt) без чтения строк таблицы).
+    :param supplier: Поставщик, цепочкой которого ограничивается отчёт (по умолчанию - вся сеть), NetworkSupplier.
+    :return: Уровни с суммой задолженности и количеством поставщиков, list[dict].
+    """
+    suppliers = supplier.get_descendants(include_self=True) if supplier else NetworkSupplier.objects.all()
+    return list(suppliers.order_by('level').values('level').annotate(suppliers=Count('id'), debt=Sum('debt')))
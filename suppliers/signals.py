@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+
+from products.models import Product
+from products.signals import products_updated
+from .cache import invalidate_network_cache, invalidate_supplier_details
+from .models import ROLLUP_FIELDS, NetworkSupplier, ProductNetworkSupplier, path_ids, shift_links_rollups
+
+
+@receiver(pre_delete, sender=NetworkSupplier)
+def remember_supplier_rollups(sender, instance, **kwargs):
+    """
+    Чтение агрегатов поддерева удаляемого поставщика до удаления: при удалении нескольких поставщиков
+    одной цепочки все они читаются до изменения агрегатов любого из них.
+    """
+    instance._deleted_rollup = NetworkSupplier.objects.filter(pk=instance.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_delete, sender=NetworkSupplier)
+def remove_supplier_rollups(sender, instance, **kwargs):
+    """Вычитание агрегатов поддерева удалённого поставщика из агрегатов вышестоящих"""
+    instance.remove_deleted_from_rollups(getattr(instance, '_deleted_rollup', None))
+
+
+@receiver(post_delete, sender=NetworkSupplier)
+def detach_supplier_descendants(sender, instance, **kwargs):
+    """Синхронизация материализованных путей потомков удалённого поставщика"""
+    # Сбрасываем кэш цепочки удалённого поставщика и его потомков (до перестроения их путей)
+    descendant_ids = NetworkSupplier.objects.filter(path__startswith=instance.path).values_list('pk', flat=True)
+    invalidate_network_cache([*path_ids(instance.path), *descendant_ids])
+    instance.detach_descendants()
+
+
+@receiver(pre_delete, sender=Product)
+def remove_product_links_rollups(sender, instance, **kwargs):
+    """Вычитание поставок удаляемого товара (удаляются каскадно) из агрегатов цепочек поставщиков"""
+    shift_links_rollups(ProductNetworkSupplier.objects.filter(product=instance), -1)
+
+
+@receiver(m2m_changed, sender=NetworkSupplier.products.through)
+def update_links_rollups(sender, instance, action, reverse, pk_set, **kwargs):
+    """Учёт поставок, изменённых через products.add/remove/set/clear, в агрегатах цепочек поставщиков"""
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+
+    links = ProductNetworkSupplier.objects.filter(product=instance) if reverse else \
+        ProductNetworkSupplier.objects.filter(network_supplier=instance)
+    if pk_set is not None:
+        links = links.filter(network_supplier__in=pk_set) if reverse else links.filter(product__in=pk_set)
+    shift_links_rollups(links, 1 if action == 'post_add' else -1)
+
+
+@receiver(products_updated, sender=Product)
+def touch_product_suppliers(sender, product_ids, **kwargs):
+    """Обновление времени изменения и сброс кэша детализации поставщиков, в ответы которых входят изменённые продукты"""
+    suppliers = NetworkSupplier.objects.filter(products__in=product_ids)
+    supplier_ids = set(suppliers.values_list('pk', flat=True))
+    if supplier_ids:
+        NetworkSupplier.objects.filter(pk__in=supplier_ids).update()
+        invalidate_supplier_details(supplier_ids)
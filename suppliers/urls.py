@@ -2,7 +2,9 @@ from django.urls import path
 
 from .apps import SuppliersConfig
 from .views import NetworkSupplierListCreateAPIView, NetworkSupplierRetrieveAPIView, NetworkSupplierUpdateAPIView, \
-    NetworkSupplierDestroyAPIView
+    NetworkSupplierDestroyAPIView, NetworkSupplierMoveAPIView, NetworkSupplierExportAPIView, \
+    NetworkSupplierImportAPIView, NetworkSupplierRollupAPIView, NetworkSupplierDebtByLevelAPIView, \
+    NetworkSupplierDebtAPIView, NetworkSupplierAnalyticsAPIView, NetworkSupplierReachabilityAPIView
 
 app_name = SuppliersConfig.name
 
@@ -11,4 +13,12 @@ urlpatterns = [
     path('supplier/<int:pk>/', NetworkSupplierRetrieveAPIView.as_view(), name='supplier-detail'),
     path('supplier/update/<int:pk>/', NetworkSupplierUpdateAPIView.as_view(), name='supplier-update'),
     path('supplier/delete/<int:pk>/', NetworkSupplierDestroyAPIView.as_view(), name='supplier-delete'),
+    path('supplier/<int:pk>/move/', NetworkSupplierMoveAPIView.as_view(), name='supplier-move'),
+    path('supplier/export/', NetworkSupplierExportAPIView.as_view(), name='supplier-export'),
+    path('supplier/import/', NetworkSupplierImportAPIView.as_view(), name='supplier-import'),
+    path('supplier/<int:pk>/rollup/', NetworkSupplierRollupAPIView.as_view(), name='supplier-rollup'),
+    path('supplier/reachability/', NetworkSupplierReachabilityAPIView.as_view(), name='supplier-reachability'),
+    path('supplier/analytics/', NetworkSupplierAnalyticsAPIView.as_view(), name='supplier-analytics'),
+    path('supplier/debt/', NetworkSupplierDebtAPIView.as_view(), name='supplier-debt'),
+    path('supplier/rollup/levels/', NetworkSupplierDebtByLevelAPIView.as_view(), name='supplier-debt-by-level'),
 ]
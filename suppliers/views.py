@@ -1,20 +1,36 @@
+import io
+
+from django.db import DataError, transaction
+from django.http import StreamingHttpResponse
 from rest_framework import generics, status
-from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from products.models import Product
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from products.cache import cached_conditional_response, conditional_response
 from products.permissions import IsAdmin
+from users.models import UserRoles
 from .permissions import IsAuthor
+from .cache import supplier_detail_key
+from .analytics import ANALYTICS_GROUPS, supplier_analytics
 from .filters import NetworkSupplierFilter
-from .models import NetworkSupplier, ProductNetworkSupplier
-from .pagination import SupplierPagination
-from .serializers import NetworkSupplierSerializer
-from .services import SupplierService, check_product_existence, check_product_ids
+from .importers import IMPORT_FORMATS, SupplierImporter
+from .ledger import LEDGER_MAX_ENTRIES, post_debt_entries
+from .models import DebtEntry, NetworkSupplier, ProductNetworkSupplier
+from .pagination import ReachabilityPagination, SupplierPagination
+from .serializers import NetworkSupplierSerializer, NetworkSupplierMoveSerializer, NetworkSupplierRollupSerializer, \
+    DebtByLevelSerializer, DebtEntrySerializer, ReachableSupplierSerializer
+from .exceptions import ProductAvailabilityError
+from .services import SupplierService, build_availability_report, check_product_ids, debt_by_level, \
+    find_missing_products, find_reachable_suppliers, stream_supplier_export_csv, stream_supplier_export_ndjson
 
 
 class NetworkSupplierListCreateAPIView(generics.ListCreateAPIView):
     """Просмотр списка и создание поставщиков"""
-    queryset = NetworkSupplier.objects.all()
+    queryset = NetworkSupplier.objects.with_products()
     serializer_class = NetworkSupplierSerializer
     pagination_class = SupplierPagination
     filter_backends = [DjangoFilterBackend]
@@ -22,6 +38,12 @@ class NetworkSupplierListCreateAPIView(generics.ListCreateAPIView):
     # Просмотр списка - все (в т.ч. неавторизованные), создание - авторизованные
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def list(self, request, *args, **kwargs):
+        """Список поставщиков с поддержкой условных запросов: 304 по валидаторам строк страницы без сериализации"""
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return conditional_response(request, page, self.paginator.get_page_state(), lambda page: (
+            self.get_paginated_response(self.get_serializer(page, many=True).data).data))
+
     def perform_create(self, serializer):
         """
         Метод, который выполняется при создании нового объекта NetworkSupplier.
@@ -29,7 +51,6 @@ class NetworkSupplierListCreateAPIView(generics.ListCreateAPIView):
         :param serializer: Сериализатор, содержащий данные для создания объекта
         """
         supplier = serializer.validated_data.get('supplier')
-        type_supplier = serializer.validated_data.get('type_supplier')
         product_ids = self.request.data.get('products')
 
         # Проверка и приведение к нужной форме id предаваемых продуктов
@@ -39,26 +60,16 @@ class NetworkSupplierListCreateAPIView(generics.ListCreateAPIView):
         if not product_ids:
             raise ValidationError('Не выбран ни один продукт')
 
-        errors = []  # сообщения об ошибках
-
-        for product_id in product_ids:
-            product = Product.objects.get(pk=product_id)
-            # Проверяем, существует ли выбранный товар (product) у родительского поставщика (supplier)
-            if supplier is not None:
-                if not supplier.products.filter(id=product_id).exists():
-                    # Проверка передаваемых данных
-                    errors.append(check_product_existence(supplier, product_id, product))
-                else:
-                    # Если товар найден у родительского поставщика, то сохраняем его
-                    SupplierService.save_supplier(serializer, product, self.request.user)
+        # Проверяем, существуют ли выбранные товары у родительского поставщика (supplier) - одним запросом
+        # (поставщика нет только у завода - уровень 0, это проверяется при валидации сериализатора)
+        if supplier is not None:
+            missing_products = find_missing_products(supplier, product_ids)
+            # если найдены ошибки, то выводим отчёт о них, ничего не сохраняя
+            if missing_products:
+                raise ProductAvailabilityError(build_availability_report(supplier, missing_products))
 
-            elif type_supplier == 0:
-                # Если товар найден и мы создаём завод (уровень 0)
-                SupplierService.save_supplier(serializer, product, self.request.user)
-
-        # если найдены ошибки, то выводим их, ничего не сохраняя
-        if errors:
-            raise ValidationError(errors)
+        # Сохраняем поставщика и все его поставки в одной транзакции
+        SupplierService.create_supplier(serializer, product_ids, self.request.user)
 
 
 class NetworkSupplierRetrieveAPIView(generics.RetrieveAPIView):
@@ -66,10 +77,19 @@ class NetworkSupplierRetrieveAPIView(generics.RetrieveAPIView):
     Детализация поставщика.
     Просматривать может только аутентифицированный пользователь.
     """
-    queryset = NetworkSupplier.objects.all()
+    queryset = NetworkSupplier.objects.with_products()
     serializer_class = NetworkSupplierSerializer
     permission_classes = [IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Детализация поставщика из кэша (сбрасывается при изменении поставщика, его цепочки или товаров)
+        с поддержкой условных запросов.
+        """
+        key = supplier_detail_key(kwargs[self.lookup_field])
+        return cached_conditional_response(request, 'supplier-detail', key, lambda: ([self.get_object()], None),
+                                           lambda objects: self.get_serializer(objects[0]).data)
+
 
 class NetworkSupplierUpdateAPIView(generics.UpdateAPIView):
     """
@@ -92,45 +112,50 @@ class NetworkSupplierUpdateAPIView(generics.UpdateAPIView):
         product_ids = self.request.data.get('products')
         # Проверка и приведение к нужной форме id предаваемых продуктов
         product_ids, product_delete_ids = check_product_ids(product_ids, True)
+        delete_ids = set(product_delete_ids)
+        # Продукты, которые остаются или добавляются поставщику (помеченные к удалению исключаются)
+        keep_ids = [product_id for product_id in product_ids if product_id not in delete_ids]
 
-        # Получаем перечень продуктов, которые имеются уже у текущего поставщика
+        # Получаем перечень продуктов, которые имеются уже у текущего поставщика (один раз, в виде множества)
         network_supplier_id = self.kwargs.get('pk')  # Получаем идентификатор из URL
-        current_products = ProductNetworkSupplier.objects.filter(network_supplier=network_supplier_id).values_list(
-            'product',
-            flat=True)
-        # Список новых продуктов на добавление (нет у редактируемого поставщика)
-        new_products_ids = [product_id for product_id in product_ids if product_id not in current_products]
-
-        errors = []  # сообщения об ошибках
-
-        for product_id in product_ids:
-            product = Product.objects.get(pk=product_id)
-            # Проверяем, существует ли выбранный товар (product) у родительского поставщика (supplier)
-            if supplier is not None:
-                if not supplier.products.filter(id=product_id).exists():
-                    # Проверка передаваемых данных
-                    errors.append(check_product_existence(supplier, product_id, product))
-                else:
-                    # Если товар есть в списке новых продуктов, то сохраняем его
-                    if product_id in new_products_ids:
-                        SupplierService.save_supplier(serializer, product, self.request.user)
-            elif type_supplier == 0:
-                # Если товар есть в списке новых продуктов, то сохраняем его (завод (уровень 0))
-                if product_id in new_products_ids:
-                    SupplierService.save_supplier(serializer, product, self.request.user)
+        current_products = set(ProductNetworkSupplier.objects.filter(
+            network_supplier=network_supplier_id).values_list('product', flat=True))
+
+        if supplier is not None:
+            # Проверяем, существуют ли выбранные товары у родительского поставщика (supplier) - одним запросом
+            missing_products = find_missing_products(supplier, keep_ids)
+            # если найдены ошибки, то выводим отчёт о них, ничего не сохраняя
+            if missing_products:
+                raise ProductAvailabilityError(build_availability_report(supplier, missing_products))
+            new_products_ids = [product_id for product_id in keep_ids if product_id not in current_products]
+        elif type_supplier == 0:
+            # Завод (уровень 0) может добавлять любые товары
+            new_products_ids = [product_id for product_id in keep_ids if product_id not in current_products]
         else:
-            # Если список продуктов был передан пустой, то просто сохраняем всё, что передали
-            serializer.save(author=self.request.user)
+            new_products_ids = []
 
-        # Удаляем продукты у текущего поставщика, помеченные на удаление.
-        # Выбираем записи ProductNetworkSupplier для удаления
-        products_to_delete = ProductNetworkSupplier.objects.filter(network_supplier=network_supplier_id,
-                                                                   product__in=product_delete_ids)
-        products_to_delete.delete()  # Удаление
+        # Сохраняем поставщика один раз, добавляем новые и удаляем помеченные продукты в одной транзакции
+        SupplierService.update_supplier(serializer, new_products_ids, list(delete_ids & current_products),
+                                        self.request.user)
 
-        # если найдены ошибки, то выводим их
-        if errors:
-            raise ValidationError(errors)
+
+class NetworkSupplierMoveAPIView(generics.UpdateAPIView):
+    """
+    Перемещение поставщика вместе со всей его цепочкой к другому поставщику.
+    Переместить могут только аутентифицированные авторы (владельцы) или администратор.
+    """
+    queryset = NetworkSupplier.objects.all()
+    serializer_class = NetworkSupplierMoveSerializer
+    permission_classes = [IsAuthenticated, IsAuthor | IsAdmin]
+
+    def perform_update(self, serializer):
+        """
+        Перемещение выполняется в одной транзакции: уровни и пути всего поддерева
+        пересчитываются при сохранении поставщика фиксированным числом запросов.
+        :param serializer: Сериализатор, содержащий нового поставщика
+        """
+        with transaction.atomic():
+            serializer.save()
 
 
 class NetworkSupplierDestroyAPIView(generics.DestroyAPIView):
@@ -138,9 +163,168 @@ class NetworkSupplierDestroyAPIView(generics.DestroyAPIView):
     Удаление поставщика.
     Удалить могут только аутентифицированные авторы (владельцы) или администратор.
     """
-    queryset = NetworkSupplier.objects.all()
+    # Для проверки автора и удаления цепочки по пути достаточно этих столбцов
+    queryset = NetworkSupplier.objects.only('id', 'author', 'path')
     permission_classes = [IsAuthenticated, IsAuthor | IsAdmin]
 
     def perform_destroy(self, instance):
         # Удаление цепочки поставщиков, идущих после удаляемого поставщика
         instance.delete_chain()
+
+
+class NetworkSupplierRollupAPIView(generics.RetrieveAPIView):
+    """
+    Агрегаты цепочки поставщика: задолженность, количество нижестоящих поставщиков и поставок.
+    Агрегаты хранятся в поставщике, поэтому ответ не зависит от размера цепочки.
+    Просматривать может только аутентифицированный пользователь.
+    """
+    queryset = NetworkSupplier.objects.only('id', 'name', 'level', 'debt', 'subtree_debt', 'subtree_suppliers',
+                                            'subtree_products')
+    serializer_class = NetworkSupplierRollupSerializer
+    permission_classes = [IsAuthenticated]
+
+
+class NetworkSupplierDebtByLevelAPIView(APIView):
+    """
+    Задолженность по уровням иерархии во всей сети или в цепочке поставщика (?supplier=<id>).
+    Просматривать может только аутентифицированный пользователь.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        supplier_id = request.query_params.get('supplier')
+        supplier = None
+        if supplier_id is not None:
+            if not supplier_id.isdigit():
+                raise ValidationError('Идентификатор поставщика должен быть целым числом.')
+            supplier = get_object_or_404(NetworkSupplier.objects.only('id', 'path'), pk=supplier_id)
+        return Response(DebtByLevelSerializer(debt_by_level(supplier), many=True).data)
+
+
+class NetworkSupplierDebtAPIView(APIView):
+    """
+    Проведение начислений и оплат задолженности поставщиков: одна запись или список записей
+    (до LEDGER_MAX_ENTRIES за запрос). Список проводится целиком или не проводится вовсе.
+    Проводить записи могут только аутентифицированные авторы (владельцы) поставщиков или администратор.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        many = isinstance(request.data, list)
+        if many and len(request.data) > LEDGER_MAX_ENTRIES:
+            raise ValidationError(f'За один запрос можно провести не более {LEDGER_MAX_ENTRIES} записей.')
+        serializer = DebtEntrySerializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data if many else [serializer.validated_data]
+
+        # Поставщики всех записей проверяются одним запросом
+        supplier_ids = {item['network_supplier_id'] for item in items}
+        authors = dict(NetworkSupplier.objects.filter(pk__in=supplier_ids).values_list('id', 'author_id'))
+        missing_ids = sorted(supplier_ids - authors.keys())
+        if missing_ids:
+            raise ValidationError(f'Поставщики не найдены: {missing_ids}.')
+        if request.user.role != UserRoles.ADMIN:
+            foreign_ids = sorted(pk for pk, author_id in authors.items() if author_id != request.user.pk)
+            if foreign_ids:
+                raise PermissionDenied(f'Вы не являетесь автором поставщиков: {foreign_ids}.')
+
+        entries = [DebtEntry(author=request.user, network_supplier_id=item['network_supplier_id'], kind=item['kind'],
+                             amount=item['amount'] if item['kind'] == DebtEntry.CHARGE else -item['amount'],
+                             comment=item.get('comment', ''))
+                   for item in items]
+        try:
+            totals = post_debt_entries(entries)
+        except DataError:
+            # Сумма записей вывела задолженность поставщика или цепочки за пределы разрядности поля
+            raise ValidationError('Задолженность поставщика превышает допустимое значение.')
+        balances = NetworkSupplier.objects.filter(pk__in=totals).order_by('pk').values_list('id', 'debt')
+        return Response({'posted': len(entries), 'suppliers': [{'id': pk, 'debt': str(debt)} for pk, debt in balances]},
+                        status=status.HTTP_201_CREATED)
+
+
+class NetworkSupplierReachabilityAPIView(generics.ListAPIView):
+    """
+    Поставщики, которые могут получить товар (?product=<id>) по своей цепочке, с расстоянием до ближайшего
+    поставщика, у которого он есть. Фильтры: город (?city=) и наибольшее расстояние (?max_depth=).
+    Просматривать может только аутентифицированный пользователь.
+    """
+    serializer_class = ReachableSupplierSerializer
+    pagination_class = ReachabilityPagination
+    filter_backends = []
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        for name in ('product', 'max_depth'):
+            if not params.get(name, '0').isdigit():
+                raise ValidationError(f'Параметр {name} должен быть целым неотрицательным числом.')
+        if 'product' not in params:
+            raise ValidationError('Не указан товар (параметр product).')
+
+        max_depth = params.get('max_depth')
+        return find_reachable_suppliers(int(params['product']), city=params.get('city'),
+                                        max_depth=int(max_depth) if max_depth is not None else None)
+
+
+class NetworkSupplierAnalyticsAPIView(APIView):
+    """
+    Аналитика сети поставщиков: количество поставщиков, задолженность и количество различных товаров
+    по странам (?group_by=country, по умолчанию), городам (city) или уровням иерархии (level).
+    Результат кэшируется до изменения сети поставщиков.
+    Просматривать может только аутентифицированный пользователь.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'country')
+        if group_by not in ANALYTICS_GROUPS:
+            raise ValidationError(f'Неизвестная группировка: {group_by}. Доступные: {", ".join(ANALYTICS_GROUPS)}.')
+
+        return Response([dict(group, debt=str(group['debt'])) for group in supplier_analytics(group_by)])
+
+
+class NetworkSupplierExportAPIView(APIView):
+    """
+    Потоковая выгрузка всей сети поставщиков с цепочками и товарами.
+    Формат задаётся параметром ?output=ndjson (по умолчанию) или ?output=csv.
+    Выгружать может только аутентифицированный пользователь.
+    """
+    permission_classes = [IsAuthenticated]
+    export_formats = {
+        'ndjson': (stream_supplier_export_ndjson, 'application/x-ndjson', 'suppliers.ndjson'),
+        'csv': (stream_supplier_export_csv, 'text/csv', 'suppliers.csv'),
+    }
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.export_formats:
+            raise ValidationError(f'Неизвестный формат выгрузки: {output}. Доступные: ndjson, csv.')
+
+        stream, content_type, filename = self.export_formats[output]
+        response = StreamingHttpResponse(stream(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class NetworkSupplierImportAPIView(APIView):
+    """
+    Пакетный импорт поставщиков из файла CSV или JSONL (поле file формы).
+    Формат задаётся параметром ?input=csv|jsonl или определяется по расширению файла.
+    Ошибочные строки не прерывают импорт и возвращаются в отчёте.
+    Импортировать может только аутентифицированный пользователь.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError('Не передан файл импорта (поле file).')
+
+        file_format = request.query_params.get('input') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise ValidationError(f'Неизвестный формат файла: {file_format}. Доступные: {", ".join(IMPORT_FORMATS)}.')
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        report = SupplierImporter(author=request.user).run(stream, file_format)
+        return Response(report, status=status.HTTP_200_OK)
@@ -0,0 +1,6 @@
+class OwnershipQueriesMixin:
+    """Проверки запросов, выполняемых при проверке владельца (автора) объекта"""
+
+    def assertNoUserQueries(self, context):
+        """Среди перехваченных запросов нет запросов к таблице пользователей"""
+        self.assertFalse([query for query in context.captured_queries if 'FROM "users_user"' in query['sql']])
@@ -1,9 +1,20 @@
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from django.utils.http import http_date
 from users.models import User
+from products.cache import cache_stats, cached_response, invalidate_product_cache
 from products.models import Product
+from tests.mixins import OwnershipQueriesMixin
 
 
 class ProductTestCase(APITestCase):
@@ -175,3 +186,321 @@ class ProductTestCase(APITestCase):
         self.assertFalse(
             Product.objects.all().exists(),
         )
+
+
+class ProductKeysetPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        # Продукты с одинаковой датой выхода - порядок внутри даты определяет id
+        release_date = timezone.now()
+        self.products = Product.objects.bulk_create([
+            Product(title=f'title_{i}', model='model', release_date=release_date) for i in range(10)
+        ])
+
+    def test_keyset_pagination(self):
+        """ Тестирование курсорной пагинации: обход всего списка без COUNT(*) и OFFSET """
+
+        url = reverse('products:product-list') + '?pagination=cursor'
+        titles = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [product['title'] for product in response.json()['results']]
+            url = response.json()['next']
+
+        self.assertEqual(titles, [product.title for product in self.products])
+
+    def test_invalid_cursor(self):
+        """ Тестирование неверного курсора """
+
+        response = self.client.get(reverse('products:product-list') + '?pagination=cursor&cursor=invalid')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Курсор с неверным значением поля сортировки
+        cursor = base64.urlsafe_b64encode(b'abc|1').decode()
+        response = self.client.get(reverse('products:product-list') + f'?pagination=cursor&cursor={cursor}')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductImportTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='vendor@test.ru')
+        self.other_user = User.objects.create(email='other@test.ru')
+        self.product = Product.objects.create(owner=self.user, title='Phone', model='X1', description='old')
+        self.other_product = Product.objects.create(owner=self.other_user, title='Phone', model='X2')
+        self.client.force_authenticate(user=self.user)
+
+    def import_file(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(reverse('products:product-import'), {'file': upload}, format='multipart')
+
+    def test_import_products(self):
+        """ Тестирование пакетной загрузки каталога: создание, обновление и ошибки по строкам """
+
+        content = ('title,model,description\n'
+                   'Phone,X1,new\n'
+                   'Phone,X2,foreign\n'
+                   'Tablet,T1,created\n'
+                   ',T2,no title\n')
+        response = self.import_file('catalog.csv', content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['updated']), (4, 1, 1))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 4])
+        self.assertIn('rows_per_second', report)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.description, 'new')
+        self.assertEqual(Product.objects.get(title='Tablet').owner, self.user)
+
+    def test_import_queries(self):
+        """ Тестирование количества запросов: не зависит от количества строк """
+
+        content = '\n'.join(f'{{"title": "Item {i}", "model": "M"}}' for i in range(200))
+        with self.assertNumQueries(4):
+            response = self.import_file('catalog.jsonl', content)
+
+        self.assertEqual(response.json()['created'], 200)
+
+
+class ProductSearchTestCase(APITestCase):
+
+    def setUp(self):
+        Product.objects.bulk_create([
+            Product(title='Смартфон', model='GX-2000', description='Флагманский телефон с большим экраном'),
+            Product(title='Ноутбук', model='ZenBook 14', description='Лёгкий ноутбук для работы'),
+            Product(title='Наушники', model='WH-1000XM4', description='Беспроводные наушники для смартфона'),
+        ])
+
+    def search(self, text):
+        response = self.client.get(reverse('products:product-list'), {'search': text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['title'] for product in response.json()['results']]
+
+    def test_full_text_search(self):
+        """ Тестирование полнотекстового поиска с ранжированием: совпадение в названии выше, чем в описании """
+
+        self.assertEqual(self.search('смартфоны'), ['Смартфон', 'Наушники'])
+        self.assertEqual(self.search('ноутбук'), ['Ноутбук'])
+        # Порядок результатов поиска задаётся рангом - курсорная пагинация по дате выхода с ним несовместима
+        response = self.client.get(reverse('products:product-list'), {'search': 'смартфоны', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('search_vector', self.client.get(reverse('products:product-list')).json()['results'][0])
+
+    def test_model_trigram_search(self):
+        """ Тестирование нечёткого поиска по номеру модели """
+
+        self.assertEqual(self.search('WH1000XM4'), ['Наушники'])
+
+
+class ProductCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='reader@test.ru')
+        self.admin = User.objects.create(email='cache_admin@test.ru', role='admin')
+        self.product = Product.objects.create(owner=self.user, title='Phone', model='X1')
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_cache(self):
+        """ Тестирование кэша списка: повтор запроса без обращений к БД, изменение каталога сбрасывает кэш """
+
+        url = reverse('products:product-list')
+        self.assertEqual(self.client.get(url).json()['count'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['count'], 1)
+        # Другие параметры запроса - другая запись кэша
+        self.assertEqual(self.client.get(url, {'search': 'tablet'}).json()['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'title': 'Tablet', 'model': 'T1'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.get(url).json()['count'], 2)
+        self.assertEqual(self.client.get(url, {'search': 'tablet'}).json()['count'], 1)
+
+    @override_settings(ALLOWED_HOSTS=['internal.local', 'public.example.com'])
+    def test_list_cache_per_host(self):
+        """ Тестирование кэша списка: абсолютные ссылки на страницы строятся по хосту своего запроса """
+
+        Product.objects.bulk_create([Product(title=f'Product {i}', model='Model') for i in range(4)])
+        url = reverse('products:product-list')
+        self.assertTrue(self.client.get(url, HTTP_HOST='internal.local').json()['next'].startswith(
+            'http://internal.local/'))
+        self.assertTrue(self.client.get(url, HTTP_HOST='public.example.com').json()['next'].startswith(
+            'http://public.example.com/'))
+
+    def test_detail_cache(self):
+        """ Тестирование кэша детализации: изменение и пакетная загрузка продукта сбрасывают кэш """
+
+        url = reverse('products:product-detail', args=[self.product.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['description'], None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'description': 'patched'})
+        self.assertEqual(self.client.get(url).json()['description'], 'patched')
+
+        upload = SimpleUploadedFile('catalog.csv', b'title,model,description\nPhone,X1,imported\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('products:product-import'), {'file': upload}, format='multipart')
+        self.assertEqual(self.client.get(url).json()['description'], 'imported')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(url)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_stats(self):
+        """ Тестирование счётчиков попаданий и промахов кэша (доступны только администратору) """
+
+        url = reverse('products:product-list')
+        for _ in range(3):
+            self.client.get(url)
+
+        stats_url = reverse('products:cache-stats')
+        self.assertEqual(self.client.get(stats_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.admin)
+        stats = self.client.get(stats_url).json()
+        self.assertEqual(stats['product-list'], {'hits': 2, 'misses': 1})
+        self.assertEqual(stats['supplier-detail'], {'hits': 0, 'misses': 0})
+
+
+class ProductConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='mobile@test.ru')
+        self.product = Product.objects.create(owner=self.user, title='Phone', model='X1')
+        self.client.force_authenticate(user=self.user)
+
+    def test_conditional_list(self):
+        """ Тестирование условного запроса списка: 304 по ETag без обращений к БД, изменение каталога - 200 """
+
+        url = reverse('products:product-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response['Last-Modified'], http_date(self.product.updated_at.timestamp()))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Промах кэша: страница загружается, но не сериализуется
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title='Tablet', model='T1')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_detail(self):
+        """ Тестирование условного запроса продукта по ETag и If-Modified-Since """
+
+        url = reverse('products:product-detail', args=[self.product.pk])
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Пакетное изменение (без save) тоже обновляет время изменения
+            Product.objects.filter(pk=self.product.pk).update(description='changed')
+            invalidate_product_cache([self.product.pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['description'], 'changed')
+
+
+class ResponseCacheSingleFlightTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def build(self):
+        with self.lock:
+            self.builds += 1
+        time.sleep(0.2)
+        return ['page']
+
+    def test_concurrent_misses(self):
+        """ Тестирование одновременных промахов: ответ строится один раз, остальные запросы ждут результата """
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: cached_response('product-list', 'test:page', self.build), range(8)))
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, [['page']] * 8)
+        self.assertEqual(cache_stats()['product-list'], {'hits': 7, 'misses': 1})
+
+    def test_stale_while_revalidate(self):
+        """ Тестирование устаревшей копии: пока ответ строится, остальные запросы получают её без ожидания """
+
+        cached_response('product-list', 'test:page:1', lambda: ['old'], stale_key='test:page:stale')
+        building, release = threading.Event(), threading.Event()
+
+        def build_until_released():
+            # Построение ответа ведущим запросом не завершается, пока не вернутся остальные запросы
+            building.set()
+            release.wait(5)
+            return self.build()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(cached_response, 'product-list', 'test:page:2', build_until_released,
+                                     'test:page:stale')
+            self.assertTrue(building.wait(5))
+            followers = [executor.submit(cached_response, 'product-list', 'test:page:2', self.build, 'test:page:stale')
+                         for _ in range(3)]
+            self.assertEqual([future.result(5) for future in followers], [['old']] * 3)
+            self.assertFalse(leader.done())
+            release.set()
+            self.assertEqual(leader.result(5), ['page'])
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(cached_response('product-list', 'test:page:2', self.build), ['page'])
+
+
+class ProductOwnershipQueriesTestCase(OwnershipQueriesMixin, APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='owner@test.ru')
+        self.product = Product.objects.create(owner=self.user, title='Phone', model='X1')
+        self.client.force_authenticate(user=self.user)
+
+    def test_update_and_delete_queries(self):
+        """ Тестирование количества запросов: проверка владельца не загружает пользователя отдельным запросом """
+
+        url = reverse('products:product-detail', args=[self.product.pk])
+        # Продукт с владельцем, изменение продукта и времени изменения его поставщиков
+        with self.assertNumQueries(3) as context:
+            response = self.client.patch(url, {'description': 'new'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['owner']['id'], self.user.pk)
+        self.assertNoUserQueries(context)
+
+        # Идентификаторы продукта, поставки (для агрегатов поставщиков), удаление поставок и продукта
+        with self.assertNumQueries(4) as context:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNoUserQueries(context)
+        self.assertNotIn('"products_product"."title"', context.captured_queries[0]['sql'])
+
+    def test_foreign_product(self):
+        """ Тестирование отказа в изменении чужого продукта """
+
+        self.client.force_authenticate(user=User.objects.create(email='stranger@test.ru'))
+        response = self.client.delete(reverse('products:product-detail', args=[self.product.pk]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Product.objects.filter(pk=self.product.pk).exists())
@@ -1,12 +1,44 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from rest_framework.test import APIClient
 from users.models import User
-from suppliers.models import NetworkSupplier, Product, ProductNetworkSupplier
+from suppliers.filters import NetworkSupplierFilter
+from suppliers.ledger import clear_debt, compact_debt_entries, post_debt_entries
+from suppliers.models import DebtEntry, NetworkSupplier, Product, ProductNetworkSupplier
 from suppliers.serializers import NetworkSupplierSerializer
-from suppliers.services import SupplierService, check_product_ids
+from suppliers.services import ALTERNATIVE_SUPPLIERS_LIMIT, SupplierService, build_availability_report, \
+    check_product_ids, find_reachable_suppliers
 from rest_framework.test import APITestCase
+from tests.mixins import OwnershipQueriesMixin
+
+
+def create_supplier(name, supplier=None, products=(), type_supplier=None, **fields):
+    """Создание поставщика: завода или, если указан вышестоящий поставщик, розничной сети"""
+    if type_supplier is None:
+        type_supplier = 1 if supplier else 0
+    supplier = NetworkSupplier.objects.create(name=name, email='suppl@test.ru', phone='+79198584502',
+                                              supplier=supplier, type_supplier=type_supplier, **fields)
+    if products:
+        supplier.products.set(products)
+    return supplier
+
+
+def create_products(count):
+    """Создание набора товаров одним запросом"""
+    return Product.objects.bulk_create([Product(title=f'Product {i}', model='Model') for i in range(count)])
 
 
 class NetworkSupplierTests(APITestCase):
@@ -110,9 +142,11 @@ class NetworkSupplierTests(APITestCase):
         supplier4.products.set([self.product.id])
 
         supplier4.save()
+        # Новый поставщик - отдельный завод: поставщик не может быть поставщиком самому себе
+        factory = create_supplier('Factory', products=[self.product.id])
         products = [self.product.id]
         data = {
-            "supplier": supplier4.id,
+            "supplier": factory.id,
             "products": products,
             "name": "Тест",
             "email": "bukashka@test.ru",
@@ -124,7 +158,7 @@ class NetworkSupplierTests(APITestCase):
         self.assertEqual(response.status_code, 200)  # Проверка успешного обновления
 
         updated_supplier = NetworkSupplier.objects.get(id=supplier4.id)
-        self.assertEqual(updated_supplier.id, 8)  # Проверка обновления имени
+        self.assertEqual(updated_supplier.id, supplier4.id)  # Проверка обновления имени
 
         # Проверка добавления новых продуктов
         self.assertTrue(updated_supplier.products.filter(id=self.product.id).exists())
@@ -145,9 +179,10 @@ class NetworkSupplierTests(APITestCase):
 
         # Сохраняем поставщика supplier3 в базе данных
         supplier5.save()
+        factory = create_supplier('Factory', products=[self.product.id, product1.id])
         products = [product1.id, product2.id]  # Новые продукты для добавления
         data = {
-            "supplier": supplier5.id,
+            "supplier": factory.id,
             "products": products,
             "name": "Тест",
             "email": "bukashka@test.ru",
@@ -156,10 +191,10 @@ class NetworkSupplierTests(APITestCase):
         }
         url = reverse('suppliers:supplier-update', kwargs={'pk': supplier5.id})
         response = self.client.put(url, data, format='json')
-        message = '["У поставщика нет товара "12 - Product2..."]'
+        message = 'У поставщика нет товара "12 - Product2..."'
         self.assertEqual(
-            response.content.decode('utf-8')[:25],
-            message[:25])
+            response.data['missing_products'][0]['message'][:23],
+            message[:23])
         self.assertEqual(response.status_code, 400)
 
     def test_retrieve_network_supplier(self):
@@ -186,15 +221,19 @@ class NetworkSupplierTests(APITestCase):
     def test_check_product_ids(self):
         """Тестирование проверки передаваемого списка id продуктов"""
 
+        # Существующий продукт и идентификаторы, которых нет в базе данных
+        product_id = self.product.id
+        missing_ids = [product_id + 1, product_id + 2, product_id + 3, product_id + 4]
+
         # При создании поставщика
-        product_ids = [1, 2, 3, 8, 11, 12, 0.5, 2.6, 'a', 'b', 'c', -5, -6]
+        product_ids = [*missing_ids[:2], product_id, *missing_ids[2:], 0.5, 2.6, 'a', 'b', 'c', -5, -6]
         product_ids_create = check_product_ids(product_ids)[0]
-        self.assertEqual(product_ids_create, [8])
+        self.assertEqual(product_ids_create, [product_id])
 
         # При изменении поставщика
-        product_ids = [1, 2, 3, 8, 11, 12, 0.5, 2.6, 'a', 'b', 'c', -5, -6]
+        product_ids = [*missing_ids[:2], product_id, *missing_ids[2:], 0.5, 2.6, 'a', 'b', 'c', -5, -6]
         product_ids_update, product_delete_ids_update = check_product_ids(product_ids, True)
-        self.assertEqual(product_ids_update, [8])
+        self.assertEqual(product_ids_update, [product_id])
         self.assertEqual(product_delete_ids_update, [5, 6])
 
         # Пустой список
@@ -202,3 +241,928 @@ class NetworkSupplierTests(APITestCase):
         product_ids_update, product_delete_ids_update = check_product_ids(product_ids, True)
         self.assertEqual(product_ids_update, [])
         self.assertEqual(product_delete_ids_update, [])
+
+
+class SupplierHierarchyTests(TestCase):
+    """Тестирование материализованного пути иерархии поставщиков"""
+
+    def setUp(self):
+        self.factory = create_supplier('Factory')
+        self.retail = create_supplier('Retail', self.factory)
+        self.shop = create_supplier('Shop', self.retail)
+
+    def test_path(self):
+        """Путь формируется при создании поставщика"""
+        self.assertEqual(self.factory.path, f'{self.factory.pk}/')
+        self.assertEqual(self.shop.path, f'{self.factory.pk}/{self.retail.pk}/{self.shop.pk}/')
+        self.assertEqual(NetworkSupplier.objects.get(pk=self.shop.pk).path, self.shop.path)
+        self.assertEqual(self.shop.depth, 2)
+
+    def test_ancestors_and_descendants(self):
+        """Предки и потомки выбираются одним запросом"""
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.shop.get_ancestors()), [self.factory, self.retail])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.factory.get_descendants()), {self.retail, self.shop})
+        self.assertEqual(set(self.retail.get_descendants(include_self=True)), {self.retail, self.shop})
+
+    def test_move_rewrites_subtree_paths(self):
+        """При смене поставщика пути всего поддерева переписываются"""
+        other_factory = create_supplier('Other factory')
+        self.retail.supplier = other_factory
+        self.retail.save()
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.path, f'{other_factory.pk}/{self.retail.pk}/{self.shop.pk}/')
+
+    def test_move_into_own_subtree(self):
+        """Поставщик не переносится в собственное поддерево ни через API, ни сохранением модели"""
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create(email='admin@example.com', role='admin'))
+        url = reverse('suppliers:supplier-update', kwargs={'pk': self.retail.pk})
+        data = {'name': 'Retail', 'email': 'suppl@test.ru', 'phone': '+79198584502', 'type_supplier': 1,
+                'supplier': self.shop.pk, 'products': []}
+        self.assertEqual(client.put(url, data, format='json').status_code, 400)
+        data['supplier'] = self.retail.pk
+        self.assertEqual(client.put(url, data, format='json').status_code, 400)
+
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        retail.supplier = NetworkSupplier.objects.get(pk=self.shop.pk)
+        with self.assertRaises(ValidationError):
+            retail.save()
+        self.assertEqual(NetworkSupplier.objects.get(pk=self.shop.pk).path, self.shop.path)
+
+    def test_move_propagates_levels(self):
+        """При смене поставщика уровни всего поддерева пересчитываются"""
+        other_factory = create_supplier('Other factory')
+        other_retail = create_supplier('Other retail', other_factory)
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        retail.supplier = other_retail
+        retail.save()
+        self.shop.refresh_from_db()
+        self.assertEqual((retail.level, self.shop.level), (2, 3))
+
+        # Завод из розничной сети: уровни потомков уменьшаются
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        retail.supplier, retail.type_supplier = None, 0
+        retail.save()
+        self.shop.refresh_from_db()
+        self.assertEqual((retail.level, self.shop.level), (0, 1))
+        self.assertEqual(self.shop.path, f'{self.retail.pk}/{self.shop.pk}/')
+
+    def test_delete_detaches_descendants(self):
+        """После удаления поставщика его потомки становятся корнями цепочек"""
+        self.factory.delete()
+        self.retail.refresh_from_db()
+        self.shop.refresh_from_db()
+        self.assertEqual(self.retail.path, f'{self.retail.pk}/')
+        self.assertEqual(self.shop.path, f'{self.retail.pk}/{self.shop.pk}/')
+
+    def test_delete_chain(self):
+        """Удаление цепочки поставщиков фиксированным числом запросов"""
+        product = Product.objects.create(title='Product', model='Model')
+        for supplier in (self.factory, self.retail, self.shop):
+            ProductNetworkSupplier.objects.create(network_supplier=supplier, product=product)
+        other_factory = create_supplier('Other factory')
+
+        with self.assertNumQueries(7):
+            self.assertEqual(self.retail.delete_chain(), (2, 2))
+        self.assertEqual(set(NetworkSupplier.objects.all()), {self.factory, other_factory})
+        self.assertEqual(ProductNetworkSupplier.objects.count(), 1)
+
+
+class SupplierMoveTests(APITestCase):
+    """Тестирование перемещения поставщика вместе с цепочкой"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='mover@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(owner=self.user, title='Product', model='Model')
+        self.factory = create_supplier('Factory', products=[self.product], author=self.user)
+        self.retail = create_supplier('Retail', self.factory, [self.product], author=self.user)
+        self.shop = create_supplier('Shop', self.retail, [self.product], author=self.user)
+        self.other_factory = create_supplier('Other factory', products=[self.product], author=self.user)
+        self.other_retail = create_supplier('Other retail', self.other_factory, [self.product], author=self.user)
+
+    def test_move_subtree(self):
+        """Поставщик перемещается вместе с цепочкой, уровни пересчитываются"""
+        url = reverse('suppliers:supplier-move', kwargs={'pk': self.retail.pk})
+        response = self.client.patch(url, {'supplier': self.other_retail.pk}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['level'], 2)
+        self.assertNotIn('path', response.data)
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.level, 3)
+        self.assertEqual(self.shop.path, f'{self.other_retail.path}{self.retail.pk}/{self.shop.pk}/')
+
+    def test_move_validation(self):
+        """Перемещение в собственную цепочку и к поставщику без нужных товаров запрещено"""
+        url = reverse('suppliers:supplier-move', kwargs={'pk': self.retail.pk})
+        response = self.client.patch(url, {'supplier': self.shop.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.other_retail.products.clear()
+        response = self.client.patch(url, {'supplier': self.other_retail.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'{self.product.id} - {self.product}', response.data['supplier'][0])
+        self.retail.refresh_from_db()
+        self.assertEqual(self.retail.supplier, self.factory)
+
+
+class SupplierAdminTests(TestCase):
+    """Тестирование списка поставщиков в админ-панели"""
+
+    def create_chain(self, depth):
+        supplier = None
+        for level in range(depth):
+            supplier = create_supplier(f'Supplier {level}', supplier, author=self.user)
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:suppliers_networksupplier_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def setUp(self):
+        self.user = User.objects.create(email='admin@example.com', role='admin')
+        self.client.force_login(self.user)
+
+    def test_changelist_queries(self):
+        """Количество запросов не зависит от числа строк и глубины цепочек"""
+        self.create_chain(2)
+        queries = self.changelist_queries()
+
+        for _ in range(5):
+            self.create_chain(4)
+        self.assertEqual(self.changelist_queries(), queries)
+
+
+class SupplierProductsTests(APITestCase):
+    """Тестирование создания и изменения поставщика с большим набором товаров"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='creator@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.products = create_products(50)
+        self.factory = create_supplier('Factory', products=self.products[:40])
+
+    def post_supplier(self, product_ids):
+        data = {
+            "supplier": self.factory.id,
+            "name": "Retail",
+            "email": "supplier@example.com",
+            "phone": "+79285678945",
+            "type_supplier": 1,
+            "products": product_ids
+        }
+        return self.client.post(reverse('suppliers:supplier-list-create'), data, format='json')
+
+    def test_create_queries(self):
+        """Количество запросов не зависит от количества товаров"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_supplier([product.id for product in self.products[:2]])
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.post_supplier([product.id for product in self.products[:40]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['products']), 40)
+
+    def test_create_missing_products(self):
+        """При отсутствии товаров у поставщика ничего не сохраняется"""
+        response = self.post_supplier([product.id for product in self.products[38:42]])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['missing_products']), 2)
+        self.assertFalse(NetworkSupplier.objects.filter(name='Retail').exists())
+
+    def test_availability_report(self):
+        """Отчёт о недоступных товарах ограничен по размеру и строится фиксированным числом запросов"""
+        retail = create_supplier('Other retail')
+        for i in range(ALTERNATIVE_SUPPLIERS_LIMIT + 2):
+            create_supplier(f'Factory {i}', products=self.products[40:])
+        missing_products = self.products[40:]
+
+        with self.assertNumQueries(3):
+            report = build_availability_report(retail, missing_products)
+
+        self.assertEqual(report['missing_products_count'], 10)
+        self.assertEqual(report['available_products_count'], 0)
+        first = report['missing_products'][0]
+        self.assertEqual(first['product']['id'], self.products[40].id)
+        self.assertEqual(len(first['suppliers']), ALTERNATIVE_SUPPLIERS_LIMIT)
+        self.assertEqual(first['suppliers_count'], ALTERNATIVE_SUPPLIERS_LIMIT + 2)
+
+    def update_supplier(self, supplier, product_ids):
+        data = {
+            "supplier": self.factory.id,
+            "name": "Retail",
+            "email": "supplier@example.com",
+            "phone": "+79285678945",
+            "type_supplier": 1,
+            "products": product_ids
+        }
+        return self.client.put(reverse('suppliers:supplier-update', kwargs={'pk': supplier.id}), data, format='json')
+
+    def test_update_queries(self):
+        """Разница товаров применяется фиксированным числом запросов"""
+        supplier = create_supplier('Retail', self.factory, self.products[:5], author=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.update_supplier(supplier, [self.products[5].id, self.products[6].id,
+                                                       -self.products[0].id])
+        self.assertEqual(response.status_code, 200)
+
+        product_ids = [product.id for product in self.products[6:40]] + [-product.id for product in self.products[1:5]]
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.update_supplier(supplier, product_ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(supplier.products.values_list('id', flat=True)),
+                         {product.id for product in self.products[5:40]})
+
+
+class SupplierProductIdsQueryTests(TestCase):
+    """Проверка id продуктов: один запрос по первичному ключу только среди запрошенных id, без чтения каталога"""
+
+    def test_single_pk_lookup(self):
+        products = create_products(20)
+        product_ids = [product.id for product in products[:5]]
+        with self.assertNumQueries(1) as context:
+            self.assertEqual(check_product_ids([*product_ids, 0, -products[5].id, 'x', 10 ** 9]),
+                             (sorted([*product_ids, products[5].id]), []))
+        sql = context.captured_queries[0]['sql']
+        self.assertIn('"products_product"."id" IN (', sql)
+        self.assertNotIn('"products_product"."title"', sql)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(check_product_ids([0, 'x']), ([], []))
+
+
+class SupplierSerializationTests(APITestCase):
+    """Тестирование количества запросов при сериализации поставщиков"""
+
+    def create_suppliers(self, count):
+        for i in range(count):
+            create_supplier(f'Retail {i}', self.factory, self.products)
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('suppliers:supplier-list-create'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def setUp(self):
+        self.user = User.objects.create(email='reader@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.products = create_products(3)
+        self.factory = create_supplier('Factory', products=self.products)
+
+    def test_list_queries(self):
+        """Страница списка сериализуется фиксированным числом запросов"""
+        self.create_suppliers(1)
+        queries = self.list_queries()
+        self.create_suppliers(8)
+        self.assertEqual(self.list_queries(), queries)
+
+    def test_detail_products(self):
+        """Детализация возвращает отсортированный список товаров за два запроса"""
+        url = reverse('suppliers:supplier-detail', kwargs={'pk': self.factory.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['products'],
+                         sorted(f'{product.id}) {product.title} - {product.model}' for product in self.products))
+
+    def test_keyset_pagination(self):
+        """Курсорная пагинация обходит весь список поставщиков"""
+        self.create_suppliers(12)
+        url = reverse('suppliers:supplier-list-create') + '?pagination=cursor'
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            names += [supplier['name'] for supplier in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, ['Factory'] + [f'Retail {i}' for i in range(12)])
+
+    def test_export(self):
+        """Потоковая выгрузка сети поставщиков в NDJSON и CSV"""
+        self.create_suppliers(2)
+        url = reverse('suppliers:supplier-export')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Factory', 'Retail 0', 'Retail 1'])
+        self.assertEqual(rows[1]['chain'], [self.factory.id])
+        self.assertEqual(rows[1]['product_ids'], [product.id for product in self.products])
+
+        response = self.client.get(url, {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[2]['chain'], str(self.factory.id))
+        self.assertEqual(rows[0]['product_ids'], ' '.join(str(product.id) for product in self.products))
+
+        self.assertEqual(self.client.get(url, {'output': 'xml'}).status_code, 400)
+
+
+class SupplierImportTests(APITestCase):
+    """Тестирование пакетного импорта поставщиков"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='importer@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.products = create_products(3)
+        self.factory = create_supplier('Factory', products=self.products[:2])
+
+    def import_file(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(reverse('suppliers:supplier-import'), {'file': upload}, format='multipart')
+
+    def test_import_jsonl(self):
+        """Импорт JSONL: родители из файла создаются раньше потомков, ошибочные строки попадают в отчёт"""
+        p1, p2, p3 = (product.id for product in self.products)
+        rows = [
+            # Потомок указан раньше родителя из того же файла
+            {'ref': 'shop', 'supplier_ref': 'retail', 'name': 'Shop', 'email': 'shop@test.ru',
+             'phone': '+79198584502', 'type_supplier': 2, 'products': [p1]},
+            {'ref': 'retail', 'supplier': self.factory.id, 'name': 'Retail', 'email': 'retail@test.ru',
+             'phone': '+79198584502', 'type_supplier': 1, 'products': [p1, p2]},
+            # Товара нет у родителя
+            {'ref': 'bad', 'supplier': self.factory.id, 'name': 'Bad', 'email': 'bad@test.ru',
+             'phone': '+79198584502', 'type_supplier': 1, 'products': [p3]},
+            # Родитель не импортирован
+            {'supplier_ref': 'bad', 'name': 'Orphan', 'email': 'orphan@test.ru', 'phone': '+79198584502',
+             'type_supplier': 2, 'products': [p3]},
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+        response = self.import_file('suppliers.jsonl', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['links']), (5, 2, 3))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+
+        retail = NetworkSupplier.objects.get(name='Retail')
+        shop = NetworkSupplier.objects.get(name='Shop')
+        self.assertEqual((retail.level, shop.level), (1, 2))
+        self.assertEqual(shop.path, f'{self.factory.id}/{retail.id}/{shop.id}/')
+        self.assertEqual(shop.author, self.user)
+
+    def test_import_parent_without_level(self):
+        """Поставщик с незаданным уровнем может быть родителем импортируемых строк"""
+        NetworkSupplier.objects.filter(pk=self.factory.pk).update(level=None)
+        product_id = self.products[0].id
+        retail = {'ref': 'retail', 'supplier': self.factory.id, 'name': 'Retail', 'email': 'retail@test.ru',
+                  'phone': '+79198584502', 'type_supplier': 1, 'products': [product_id]}
+        shop = {'supplier_ref': 'retail', 'name': 'Shop', 'email': 'shop@test.ru', 'phone': '+79198584502',
+                'type_supplier': 2, 'products': [product_id]}
+        response = self.import_file('suppliers.jsonl', '\n'.join(json.dumps(row) for row in (retail, shop)))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['errors']), (2, []))
+        levels = NetworkSupplier.objects.filter(name__in=['Retail', 'Shop']).values_list('level', flat=True)
+        self.assertEqual(list(levels), [None, None])
+
+    def test_import_csv(self):
+        """Импорт CSV: списки товаров разделяются пробелами"""
+        p1, p2, _ = (product.id for product in self.products)
+        content = ('name,email,phone,type_supplier,supplier,products\n'
+                   f'Retail,retail@test.ru,+79198584502,1,{self.factory.id},{p1} {p2}\n'
+                   'Factory 2,factory@test.ru,+79198584502,0,,' + f'{p1}\n')
+        response = self.import_file('suppliers.csv', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['links'], response.data['errors']), (2, 3, []))
+        self.assertEqual(NetworkSupplier.objects.get(name='Factory 2').level, 0)
+
+    def test_import_unknown_format(self):
+        """Неизвестный формат файла"""
+        response = self.import_file('suppliers.xml', '<suppliers/>')
+        self.assertEqual(response.status_code, 400)
+
+
+class SupplierFilterTests(APITestCase):
+    """Тестирование фильтров списка поставщиков и использования ими индексов"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='reader@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.factory = create_supplier('Factory', country='Россия', city='Москва')
+        self.retail = create_supplier('Retail', self.factory, country='Россия', city='Казань', debt=150)
+        create_supplier('Shop', self.retail, type_supplier=2, country='Беларусь', city='Минск', debt=20)
+
+    def filter_names(self, **params):
+        response = self.client.get(reverse('suppliers:supplier-list-create'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(supplier['name'] for supplier in response.json()['results'])
+
+    def assertUsesIndex(self, index_name, **params):
+        """Фильтр выполняется сканированием указанного индекса (последовательное сканирование запрещено)"""
+        queryset = NetworkSupplierFilter(params, queryset=NetworkSupplier.objects.all()).qs
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_filters(self):
+        self.assertEqual(self.filter_names(country='РОССИЯ'), ['Factory', 'Retail'])
+        self.assertEqual(self.filter_names(country='россия', city='казань'), ['Retail'])
+        self.assertEqual(self.filter_names(level=2), ['Shop'])
+        self.assertEqual(self.filter_names(type_supplier=1), ['Retail'])
+        self.assertEqual(self.filter_names(debt_min=10, debt_max=100), ['Shop'])
+        self.assertEqual(self.filter_names(supplier=self.factory.id), ['Retail'])
+
+    def test_filters_use_indexes(self):
+        # Заводы с разной задолженностью и статистика таблицы, как в рабочей БД, - иначе для нескольких строк
+        # индексы одинаково дёшевы и выбор между ними случаен
+        NetworkSupplier.objects.bulk_create([NetworkSupplier(name=f'Factory {i}', email='suppl@test.ru',
+                                                             phone='+79198584502', debt=i) for i in range(2000)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE suppliers_networksupplier')
+        self.assertUsesIndex('supplier_city_idx', city='москва')
+        self.assertUsesIndex('supplier_country_city_idx', country='россия')
+        self.assertUsesIndex('supplier_country_city_idx', country='россия', city='москва')
+        self.assertUsesIndex('supplier_level_debt_idx', level=1)
+        self.assertUsesIndex('supplier_level_debt_idx', level=1, debt_min=100)
+        self.assertUsesIndex('supplier_type_debt_idx', type_supplier=2, debt_max=100)
+        self.assertUsesIndex('supplier_debt_idx', debt_min=10, debt_max=100)
+        self.assertUsesIndex('networksupplier_supplier_id', supplier=self.factory.id)
+
+
+class SupplierRollupTests(APITestCase):
+    """Тестирование агрегатов цепочек поставщиков"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='finance@example.com', password='testpassword', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.products = create_products(3)
+        self.factory = create_supplier('Factory', debt=100, products=self.products)
+        self.retail = create_supplier('Retail', self.factory, debt=50, products=self.products[:2])
+        self.shop = create_supplier('Shop', self.retail, debt=20, products=self.products[:1])
+        self.other_factory = create_supplier('Other factory', products=self.products)
+
+    def assertRollupsConsistent(self):
+        """Агрегаты совпадают с посчитанными обходом всех поставщиков"""
+        suppliers = list(NetworkSupplier.objects.annotate(links=Count('productnetworksupplier')))
+        for supplier in suppliers:
+            subtree = [other for other in suppliers if other.path.startswith(supplier.path)]
+            self.assertEqual(
+                (supplier.subtree_debt, supplier.subtree_suppliers, supplier.subtree_products),
+                (sum(other.debt for other in subtree), len(subtree), sum(other.links for other in subtree)),
+                supplier.name)
+
+    def rollup(self, supplier):
+        response = self.client.get(reverse('suppliers:supplier-rollup', kwargs={'pk': supplier.pk}))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rollup_api(self):
+        with self.assertNumQueries(1):
+            rollup = self.rollup(self.factory)
+        self.assertEqual(rollup['subtree_debt'], '170.00')
+        self.assertEqual(rollup['descendants_count'], 2)
+        self.assertEqual(rollup['subtree_products'], 6)
+        self.assertRollupsConsistent()
+
+    def test_debt_by_level(self):
+        url = reverse('suppliers:supplier-debt-by-level')
+        self.assertEqual(self.client.get(url).json(), [
+            {'level': 0, 'suppliers': 2, 'debt': '100.00'},
+            {'level': 1, 'suppliers': 1, 'debt': '50.00'},
+            {'level': 2, 'suppliers': 1, 'debt': '20.00'},
+        ])
+        self.assertEqual(len(self.client.get(url, {'supplier': self.retail.pk}).json()), 2)
+
+    def test_save_updates_rollups(self):
+        """Изменение задолженности и перемещение поставщика изменяют агрегаты цепочек"""
+        shop = NetworkSupplier.objects.get(pk=self.shop.pk)
+        shop.debt = 35
+        shop.save()
+        self.assertRollupsConsistent()
+
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        retail.supplier, retail.debt = self.other_factory, 10
+        retail.save()
+        self.assertRollupsConsistent()
+        self.assertEqual(self.rollup(self.other_factory)['descendants_count'], 2)
+
+    def test_links_update_rollups(self):
+        """Поставки, изменённые любым способом, учитываются в агрегатах"""
+        self.shop.products.add(self.products[1])
+        self.retail.products.remove(self.products[0])
+        self.assertRollupsConsistent()
+        self.products[2].delete()
+        self.assertRollupsConsistent()
+        ProductNetworkSupplier.objects.create(network_supplier=self.shop, product=self.products[0])
+        ProductNetworkSupplier.objects.filter(network_supplier=self.factory).first().delete()
+        self.assertRollupsConsistent()
+
+    def test_delete_updates_rollups(self):
+        self.shop.delete()
+        self.assertRollupsConsistent()
+        self.retail.delete_chain()
+        self.assertRollupsConsistent()
+        self.assertEqual(self.rollup(self.factory)['subtree_debt'], '100.00')
+
+    def test_save_stale_instance(self):
+        """Сохранение объекта, загруженного до перемещения его вышестоящего, не откатывает путь и агрегаты"""
+        shop = NetworkSupplier.objects.get(pk=self.shop.pk)
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        retail.supplier = self.other_factory
+        retail.save()
+        shop.name = 'Renamed shop'
+        shop.save()
+        self.assertRollupsConsistent()
+        shop.refresh_from_db()
+        self.assertEqual(shop.path, f'{self.other_factory.pk}/{self.retail.pk}/{self.shop.pk}/')
+        self.assertEqual(self.rollup(self.factory)['subtree_debt'], '100.00')
+
+    def test_delete_link_author(self):
+        """Удаление автора поставки у чужого поставщика не удаляет поставку и сохраняет агрегаты"""
+        admin = User.objects.create(email='admin@example.com', password='testpassword', role='admin')
+        link = ProductNetworkSupplier.objects.create(network_supplier=self.shop, product=self.products[1], author=admin)
+        admin.delete()
+        link.refresh_from_db()
+        self.assertIsNone(link.author)
+        self.assertRollupsConsistent()
+
+    def test_delete_nested_suppliers_together(self):
+        """Поддерево поставщика, удалённого вместе с вышестоящим, не вычитается из цепочки дважды"""
+        NetworkSupplier.objects.filter(pk__in=[self.shop.pk, self.retail.pk]).delete()
+        self.assertRollupsConsistent()
+
+        retail = create_supplier('Retail', self.factory, debt=50, author=self.user)
+        create_supplier('Shop', retail, debt=20, author=self.user)
+        # Каскадное удаление поставщиков вместе с их автором
+        self.user.delete()
+        self.assertRollupsConsistent()
+        self.factory.refresh_from_db()
+        self.assertEqual((self.factory.subtree_debt, self.factory.subtree_suppliers), (100, 1))
+
+    def test_bulk_changes_update_rollups(self):
+        """Пакетный импорт и обнуление задолженности учитываются в агрегатах"""
+        row = {'supplier': self.retail.pk, 'name': 'Imported', 'email': 'imported@test.ru', 'phone': '+79198584502',
+               'type_supplier': 2, 'debt': '5.50', 'products': [self.products[0].id]}
+        upload = SimpleUploadedFile('suppliers.jsonl', json.dumps(row).encode())
+        response = self.client.post(reverse('suppliers:supplier-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertRollupsConsistent()
+
+        clear_debt(NetworkSupplier.objects.filter(pk__in=[self.retail.pk, self.shop.pk]))
+        self.assertRollupsConsistent()
+        self.assertEqual(self.rollup(self.factory)['subtree_debt'], '105.50')
+
+
+class SupplierLedgerTests(APITestCase):
+    """Тестирование журнала задолженности поставщиков"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='finance@example.com', password='testpassword', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.factory = create_supplier('Factory', debt=100)
+        self.retail = create_supplier('Retail', self.factory, author=self.user)
+
+    def post_entries(self, data):
+        return self.client.post(reverse('suppliers:supplier-debt'), data, format='json')
+
+    def assertLedgerBalanced(self):
+        """Задолженность каждого поставщика равна сумме его записей журнала"""
+        for supplier in NetworkSupplier.objects.annotate(ledger=Sum('debt_entries__amount')):
+            self.assertEqual(supplier.debt, supplier.ledger or 0, supplier.name)
+
+    def test_post_entries(self):
+        response = self.post_entries({'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '30.50'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['suppliers'], [{'id': self.retail.id, 'debt': '30.50'}])
+
+        entries = [{'network_supplier': self.retail.id, 'kind': 'payment', 'amount': '0.01'}] * 2000
+        entries.append({'network_supplier': self.factory.id, 'kind': 'payment', 'amount': '40'})
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_entries(entries)
+        self.assertEqual(response.json()['posted'], 2001)
+        self.assertLessEqual(len(context.captured_queries), 12)
+
+        self.retail.refresh_from_db()
+        self.factory.refresh_from_db()
+        self.assertEqual((self.retail.debt, self.factory.debt, self.factory.subtree_debt), (10.5, 60, 70.5))
+        self.assertLedgerBalanced()
+
+    def test_debt_read_only(self):
+        """Задолженность не перезаписывается изменением поставщика"""
+        self.post_entries({'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '15'})
+        retail = NetworkSupplier.objects.get(pk=self.retail.pk)
+        NetworkSupplier.objects.get(pk=self.retail.pk).save()
+        retail.name = 'Renamed'
+        retail.save()
+        retail.refresh_from_db()
+        self.assertEqual(retail.debt, 15)
+        self.assertTrue(NetworkSupplierSerializer().fields['debt'].read_only)
+
+    def test_internal_fields(self):
+        """Путь в иерархии не выводится, агрегаты цепочки не изменяются через API поставщика"""
+        fields = NetworkSupplierSerializer().fields
+        self.assertNotIn('path', fields)
+        for field_name in ('subtree_debt', 'subtree_suppliers', 'subtree_products', 'updated_at'):
+            self.assertTrue(fields[field_name].read_only, field_name)
+
+    def test_post_validation(self):
+        response = self.post_entries([{'network_supplier': 0, 'kind': 'charge', 'amount': '1'}])
+        self.assertEqual(response.status_code, 400)
+        response = self.post_entries({'network_supplier': self.retail.id, 'kind': 'snapshot', 'amount': '1'})
+        self.assertEqual(response.status_code, 400)
+
+        # Пользователь может проводить записи только своих поставщиков
+        self.user.role = 'user'
+        self.user.save()
+        response = self.post_entries([{'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '1'},
+                                      {'network_supplier': self.factory.id, 'kind': 'charge', 'amount': '1'}])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(DebtEntry.objects.filter(kind='charge').exists())
+
+    def test_post_overflow(self):
+        """Сумма, не помещающаяся в задолженность поставщика, отклоняется проверкой, а не ошибкой сервера"""
+        response = self.post_entries({'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '99999999999.00'})
+        self.assertEqual(response.status_code, 400)
+        response = self.post_entries([{'network_supplier': self.retail.id, 'kind': 'charge',
+                                       'amount': '99999999.99'}] * 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DebtEntry.objects.filter(kind='charge').exists())
+        self.assertLedgerBalanced()
+
+    def test_clear_debt_and_compaction(self):
+        """Погашение задолженности проводится оплатой, сжатие журнала сохраняет задолженность"""
+        self.post_entries([{'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '5'}] * 3)
+        self.assertEqual(clear_debt(NetworkSupplier.objects.all(), author=self.user), 2)
+        self.assertEqual(DebtEntry.objects.filter(kind='payment').count(), 2)
+        self.assertLedgerBalanced()
+
+        self.post_entries({'network_supplier': self.retail.id, 'kind': 'charge', 'amount': '7'})
+        self.assertEqual(compact_debt_entries(timezone.now()), (7, 2))
+        self.assertEqual(list(DebtEntry.objects.filter(network_supplier=self.retail).values_list('kind', 'amount')),
+                         [('snapshot', 7)])
+        self.assertLedgerBalanced()
+
+
+class SupplierAnalyticsTests(APITestCase):
+    """Тестирование аналитики сети поставщиков и её кэширования"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='ops@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.products = create_products(3)
+        self.factory = create_supplier('Factory', products=self.products, country='Россия', city='Москва', debt=100)
+        create_supplier('Retail', self.factory, self.products[:2], country='Россия', city='Казань', debt=50)
+        create_supplier('Shop', self.factory, self.products[:1], country='Беларусь', city='Минск', debt=20)
+
+    def analytics(self, group_by=None):
+        params = {'group_by': group_by} if group_by else {}
+        response = self.client.get(reverse('suppliers:supplier-analytics'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_analytics(self):
+        self.assertEqual(self.analytics(), [
+            {'country': 'Беларусь', 'suppliers': 1, 'debt': '20.00', 'products': 1},
+            {'country': 'Россия', 'suppliers': 2, 'debt': '150.00', 'products': 3},
+        ])
+        self.assertEqual(self.analytics('city')[0], {'country': 'Беларусь', 'city': 'Минск', 'suppliers': 1,
+                                                     'debt': '20.00', 'products': 1})
+        self.assertEqual([group['suppliers'] for group in self.analytics('level')], [1, 2])
+        response = self.client.get(reverse('suppliers:supplier-analytics'), {'group_by': 'street'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_analytics_cache(self):
+        """Повторный запрос не обращается к БД, изменение сети сбрасывает кэш"""
+        self.analytics()
+        with self.assertNumQueries(0):
+            self.analytics()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_supplier('Other shop', self.factory, country='Беларусь', city='Минск', debt=5)
+        self.assertEqual(self.analytics()[0]['suppliers'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_debt_entries([DebtEntry(network_supplier_id=self.factory.pk, kind=DebtEntry.CHARGE, amount=1)])
+        self.assertEqual(self.analytics()[1]['debt'], '151.00')
+
+
+class SupplierReachabilityTests(APITestCase):
+    """Тестирование поиска поставщиков, которые могут получить товар по своей цепочке"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='sales@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.product, other_product = Product.objects.bulk_create([Product(title='Product', model='Model'),
+                                                                   Product(title='Other', model='Model')])
+        factory = create_supplier('Factory', products=[self.product, other_product], city='Москва')
+        retail = create_supplier('Retail', factory, [self.product], city='Казань')
+        create_supplier('Shop', retail, city='Казань')
+        other_retail = create_supplier('Other retail', factory, [other_product], city='Москва')
+        create_supplier('Other shop', other_retail, city='Москва')
+        other_factory = create_supplier('Other factory', products=[other_product], city='Казань')
+        create_supplier('Foreign shop', other_factory, city='Казань')
+
+    def reachable(self, **params):
+        response = self.client.get(reverse('suppliers:supplier-reachability'), dict(params, product=self.product.id))
+        self.assertEqual(response.status_code, 200)
+        return [(supplier['name'], supplier['distance']) for supplier in response.json()['results']]
+
+    def test_reachability(self):
+        # Страница и количество строк - запросы постоянного размера независимо от количества держателей товара
+        with self.assertNumQueries(2):
+            suppliers = self.reachable()
+        self.assertEqual(suppliers, [('Factory', 0), ('Retail', 0), ('Shop', 1), ('Other retail', 1),
+                                     ('Other shop', 2)])
+        self.assertEqual(self.reachable(city='казань'), [('Retail', 0), ('Shop', 1)])
+        # Параметр page_size - номер страницы, как и в остальных списках
+        response = self.client.get(reverse('suppliers:supplier-reachability'), {'product': self.product.id,
+                                                                                  'page_size': 2})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.reachable(max_depth=1), [('Factory', 0), ('Retail', 0), ('Shop', 1),
+                                                       ('Other retail', 1)])
+
+        response = self.client.get(reverse('suppliers:supplier-reachability'), {'product': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reachability_uses_path_index(self):
+        # Другие цепочки сети и статистика таблиц, как в рабочей БД, - иначе выбор плана для нескольких строк случаен
+        NetworkSupplier.objects.bulk_create([NetworkSupplier(name=f'Other {i}', email='suppl@test.ru',
+                                                             phone='+79198584502', path=f'0{i}/') for i in range(2000)])
+        suppliers = find_reachable_suppliers(self.product.id, max_depth=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE suppliers_networksupplier')
+            cursor.execute('ANALYZE suppliers_productnetworksupplier')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = suppliers.explain()
+        self.assertIn('supplier_path_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+        # Размер запроса не зависит от количества поставщиков, у которых есть товар
+        NetworkSupplier.objects.get(name='Other shop').products.add(self.product)
+        self.assertEqual(str(find_reachable_suppliers(self.product.id, max_depth=1).query), str(suppliers.query))
+
+
+class SupplierResponseCacheTests(APITestCase):
+    """Тестирование кэша детализации поставщиков и его точного сброса по цепочке"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='viewer@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(title='Product', model='Model')
+        self.factory = create_supplier('Factory')
+        self.retail = create_supplier('Retail', self.factory)
+        self.shop = create_supplier('Shop', self.retail)
+        self.other_retail = create_supplier('Other retail', self.factory)
+
+    def detail(self, supplier):
+        response = self.client.get(reverse('suppliers:supplier-detail', kwargs={'pk': supplier.pk}))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertCached(self, *suppliers):
+        with self.assertNumQueries(0):
+            for supplier in suppliers:
+                self.detail(supplier)
+
+    def test_detail_cache(self):
+        """Изменение поставщика сбрасывает кэш его цепочки, но не соседних поставщиков"""
+        for supplier in (self.factory, self.retail, self.shop, self.other_retail):
+            self.detail(supplier)
+        self.assertCached(self.factory, self.retail, self.shop, self.other_retail)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductNetworkSupplier.objects.create(network_supplier=self.retail, product=self.product)
+        self.assertCached(self.shop, self.other_retail)
+        self.assertEqual(self.detail(self.retail)['subtree_products'], 1)
+        self.assertEqual(self.detail(self.factory)['subtree_products'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_debt_entries([DebtEntry(network_supplier_id=self.shop.pk, kind=DebtEntry.CHARGE, amount=10)])
+        self.assertCached(self.other_retail)
+        self.assertEqual(self.detail(self.shop)['debt'], '10.00')
+        self.assertEqual(self.detail(self.factory)['subtree_debt'], '10.00')
+
+    def test_move_and_product_changes(self):
+        """Перенос сбрасывает кэш поддерева, изменение товара - кэш детализаций с товарами"""
+        for supplier in (self.retail, self.shop, self.other_retail):
+            self.detail(supplier)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.retail.supplier = self.other_retail
+            self.retail.save()
+        self.assertEqual(self.detail(self.shop)['level'], 3)
+        self.assertEqual(self.detail(self.other_retail)['subtree_suppliers'], 3)
+
+        self.shop.products.add(self.product)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = 'Renamed'
+            self.product.save()
+        # Сбрасывается только детализация поставщиков изменённого товара
+        self.assertCached(self.other_retail)
+        self.assertEqual(self.detail(self.shop)['products'], [f'{self.product.pk}) Renamed - Model'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.retail.delete()
+        self.assertIsNone(self.detail(self.shop)['supplier'])
+        self.assertEqual(self.detail(self.other_retail)['subtree_suppliers'], 1)
+
+
+class SupplierConditionalGetTests(APITestCase):
+    """Тестирование условных запросов списка и детализации поставщиков"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='mobile@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(title='Product', model='Model')
+        self.factory = create_supplier('Factory', products=[self.product])
+
+    def assertNotModified(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_conditional_list(self):
+        url = reverse('suppliers:supplier-list-create')
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        self.assertNotModified(url + '?pagination=cursor', self.client.get(url + '?pagination=cursor')['ETag'])
+
+        # Изменение товара поставщика изменяет время изменения поставщика
+        updated_at = NetworkSupplier.objects.get(pk=self.factory.pk).updated_at
+        self.product.title = 'Renamed'
+        self.product.save()
+        self.assertGreater(NetworkSupplier.objects.get(pk=self.factory.pk).updated_at, updated_at)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.factory.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_conditional_detail(self):
+        """Изменение агрегатов цепочки изменяет валидаторы детализации вышестоящего поставщика"""
+        url = reverse('suppliers:supplier-detail', kwargs={'pk': self.factory.pk})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_supplier('Retail', self.factory)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['subtree_suppliers'], 2)
+
+
+class SupplierOwnershipQueriesTests(OwnershipQueriesMixin, APITestCase):
+    """Тестирование количества запросов проверки автора при изменении и удалении поставщика"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='author@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.factory = create_supplier('Factory', author=self.user)
+
+    def test_update_and_delete_queries(self):
+        """Проверка автора сравнивает идентификаторы и не загружает пользователя отдельным запросом"""
+        url = reverse('suppliers:supplier-update', kwargs={'pk': self.factory.pk})
+        data = {'name': 'Renamed', 'email': 'suppl@test.ru', 'phone': '+79198584502', 'type_supplier': 0,
+                'supplier': None, 'products': []}
+        with self.assertNumQueries(9) as context:
+            response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoUserQueries(context)
+
+        with self.assertNumQueries(7) as context:
+            response = self.client.delete(reverse('suppliers:supplier-delete', kwargs={'pk': self.factory.pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertNoUserQueries(context)
+        # Удаляемый поставщик загружается только со столбцами, нужными для проверки автора и удаления цепочки
+        self.assertNotIn('"suppliers_networksupplier"."name"', context.captured_queries[0]['sql'])
+
+    def test_foreign_supplier(self):
+        """Чужого поставщика удалить нельзя"""
+        self.client.force_authenticate(user=User.objects.create(email='stranger@example.com'))
+        response = self.client.delete(reverse('suppliers:supplier-delete', kwargs={'pk': self.factory.pk}))
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(NetworkSupplier.objects.filter(pk=self.factory.pk).exists())
+
+
+class SupplierLedgerConcurrencyTests(TransactionTestCase):
+    """Параллельные проводки не теряют изменений задолженности"""
+
+    def test_concurrent_postings(self):
+        supplier = create_supplier('Factory')
+
+        def post(worker):
+            try:
+                for _ in range(10):
+                    post_debt_entries([DebtEntry(network_supplier_id=supplier.pk, kind=DebtEntry.CHARGE, amount=1)])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(post, range(4)))
+
+        supplier.refresh_from_db()
+        self.assertEqual((supplier.debt, supplier.subtree_debt), (40, 40))
@@ -1,5 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.permissions import IsAdmin
+from users.authentication import ClaimsJWTAuthentication
 
 
 class UsersManagersTests(TestCase):
@@ -37,3 +44,54 @@ class UsersManagersTests(TestCase):
             pass
         with self.assertRaises(ValueError):
             User.objects.create_superuser(email="", password="123qwe456asd", role='admin')
+
+
+class ClaimsAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email="claims@user.ru", password="123qwe456asd")
+        self.admin = User.objects.create_superuser(email="claims_admin@user.ru", password="456qwe123asd")
+        self.authentication = ClaimsJWTAuthentication()
+
+    def obtain_token(self, email, password):
+        response = self.client.post(reverse('jwt-create'), {'email': email, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['access']
+
+    def authenticate(self, token):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.authentication.authenticate(request)[0]
+
+    def test_claims_without_queries(self):
+        """ Роль и активность берутся из утверждений токена, права проверяются без запросов к БД """
+        token = self.obtain_token("claims_admin@user.ru", "456qwe123asd")
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(0):
+            request.user = self.authenticate(token)
+            self.assertEqual(request.user.pk, self.admin.pk)
+            self.assertTrue(IsAdmin().has_permission(request, None))
+            self.assertTrue(IsAdmin().has_object_permission(request, None, None))
+        # Остальные поля загружаются из БД при обращении
+        self.assertEqual(request.user.email, "claims_admin@user.ru")
+
+    def test_token_without_claims(self):
+        """ Токен без утверждений проверяется по БД """
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(token), self.user)
+
+    def test_revocation(self):
+        """ Изменение роли или активности отзывает выпущенные ранее токены """
+        token = self.obtain_token("claims@user.ru", "123qwe456asd")
+        self.assertEqual(self.authenticate(token).role, 'user')
+
+        self.user.first_name = 'Name'
+        self.user.save()
+        self.authenticate(token)
+
+        self.user.role = 'admin'
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
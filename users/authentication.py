@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import User
+
+# Утверждения токена с правами пользователя (добавляются сериализатором получения токена)
+ROLE_CLAIM = 'role'
+ACTIVE_CLAIM = 'is_active'
+
+# Отзыв токенов при изменении прав: момент отзыва хранится в общем кэше, а его чтение кэшируется
+# в памяти процесса - изменение прав вступает в силу не позже чем через DENYLIST_LOCAL_TIMEOUT
+REVOKED_KEY = 'users:revoked:{user_id}'
+DENYLIST_LOCAL_TIMEOUT = 30  # время хранения результата проверки в памяти процесса, с
+_denylist = {}  # идентификатор пользователя -> (срок хранения, момент отзыва или None)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Отзыв токенов пользователя, выпущенных до текущего момента (права в их утверждениях устарели).
+    Отметка хранится, пока действуют токены обновления, выпущенные до отзыва.
+    :param user_id: Идентификатор пользователя.
+    """
+    lifetime = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds()
+    cache.set(REVOKED_KEY.format(user_id=user_id), int(time.time()), int(lifetime))
+    _denylist.pop(user_id, None)
+
+
+def is_token_revoked(user_id, issued_at: int) -> bool:
+    """
+    Проверка отзыва токена по моменту его выпуска.
+    :param user_id: Идентификатор пользователя.
+    :param issued_at: Момент выпуска токена (утверждение iat), int.
+    :return: Флаг отзыва, bool.
+    """
+    expires, revoked_at = _denylist.get(user_id, (0, None))
+    if expires < time.monotonic():
+        revoked_at = cache.get(REVOKED_KEY.format(user_id=user_id))
+        _denylist[user_id] = (time.monotonic() + DENYLIST_LOCAL_TIMEOUT, revoked_at)
+    # Токены, выпущенные в ту же секунду, что и отзыв, тоже считаются отозванными
+    return revoked_at is not None and issued_at <= revoked_at
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без запроса пользователя к БД: роль и активность берутся из подписанных утверждений
+    токена, а пользователь создаётся без обращения к БД (остальные поля загружаются из БД при первом обращении).
+    Токены без утверждений (выпущенные до их добавления) проверяются по БД.
+    Изменение роли или активности пользователя отзывает выпущенные ранее токены (см. revoke_user_tokens),
+    поэтому при нескольких процессах нужен общий бэкенд кэша.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token or ACTIVE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if is_token_revoked(user_id, validated_token['iat']):
+            raise AuthenticationFailed('Права пользователя изменены, выполните вход повторно.', code='token_revoked')
+        if not validated_token[ACTIVE_CLAIM]:
+            raise AuthenticationFailed('Пользователь неактивен.', code='user_inactive')
+
+        return User.from_db(router.db_for_read(User), ['id', 'role', 'is_active'],
+                            [user_id, validated_token[ROLE_CLAIM], validated_token[ACTIVE_CLAIM]])
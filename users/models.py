@@ -66,6 +66,21 @@ class User(AbstractBaseUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Загрузка пользователя из БД с запоминанием прав, входящих в утверждения токенов"""
+        instance = super().from_db(db, field_names, values)
+        instance.remember_claims()
+        return instance
+
+    def remember_claims(self):
+        """Запоминание роли и активности для обнаружения их изменения"""
+        self._loaded_claims = (self.__dict__.get('role'), self.__dict__.get('is_active'))
+
+    def claims_changed(self) -> bool:
+        """Изменились ли роль или активность с момента загрузки"""
+        return getattr(self, '_loaded_claims', None) != (self.__dict__.get('role'), self.__dict__.get('is_active'))
+
     @property
     def is_admin(self):
         """ Админ, если роль == 'admin' """
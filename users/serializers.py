@@ -1,6 +1,9 @@
 from djoser.serializers import UserSerializer as BaseUserSerializer, \
     UserCreateSerializer as BaseUserRegistrationSerializer, UserCreatePasswordRetypeSerializer
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from users.authentication import ACTIVE_CLAIM, ROLE_CLAIM
 
 
 User = get_user_model()
@@ -24,3 +27,14 @@ class CustomUserCreatePasswordRetypeSerializer(UserCreatePasswordRetypeSerialize
     """ Сериализация повторной проверки пароля, вводимого пользователем """
     class Meta(UserCreatePasswordRetypeSerializer.Meta):
         fields = ('id', 'first_name', 'last_name', 'phone', 'email', 'password')
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ Получение пары токенов с ролью и активностью пользователя в утверждениях (для ClaimsJWTAuthentication) """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ROLE_CLAIM] = user.role
+        token[ACTIVE_CLAIM] = user.is_active
+        return token
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import revoke_user_tokens
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, created, **kwargs):
+    """Отзыв токенов пользователя, роль или активность которого изменились"""
+    if not created and instance.claims_changed():
+        revoke_user_tokens(instance.pk)
+    instance.remember_claims()
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    """Отзыв токенов удалённого пользователя"""
+    revoke_user_tokens(instance.pk)